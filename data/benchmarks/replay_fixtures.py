@@ -0,0 +1,192 @@
+"""
+File: replay_fixtures.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Synthetic fixtures shaped like the recorded Rate My Professor responses and TRACE report pages
+"""
+
+# import necessary libraries
+import json
+import math
+import os
+import random
+import sys
+
+# run as a script, the shared modules under data/ and the rate my professor scraper have to be importable (a
+# script importing this one has already set that up)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rmp'))
+
+from profile_extraction import PROFILE_SELECTORS
+from ratemyprof_api import RateMyProfApi
+from replay_server import TRACE_DIR, write_fixture
+from data_scrape_rmp import professor_url
+
+
+# tags and departments the synthetic professors are given
+TAGS = ['Caring', 'Tough grader', 'Amazing lectures', 'Lots of homework', 'Clear grading criteria',
+        'Respected', 'Gives good feedback', 'Get ready to read']
+DEPARTMENTS = ['Mathematics', 'Computer Science', 'Biology', 'English', 'Economics', 'Physics']
+
+# a trace report has one chart per question category inside #chart_55
+TRACE_CHARTS = [
+    ['Course related questions:', ['The syllabus was accurate', 'Required materials were useful',
+                                   'Online course materials were organized', 'Assignments helped me learn']],
+    ['Instructor related questions:', ['The instructor came to class prepared',
+                                       'The instructor used class time effectively',
+                                       'The instructor was available outside of class',
+                                       'The instructor treated students with respect',
+                                       'I learned a lot from this instructor']],
+]
+
+
+def _element(key, content):
+    # an element the profile extractors look for, with the exact class they match on
+    tag, class_ = PROFILE_SELECTORS[key]
+    tag = tag or 'span'
+    return f'<{tag} class="{class_}">{content}</{tag}>'
+
+
+def profile_page(num_of_ratings, rating, would_take_again, difficulty, tags):
+    """
+    :return: the html of a professor's page, with the elements the extractors read
+    """
+    feedback = _element('feedback_number', f"{round(would_take_again * 100)}%") + \
+        _element('feedback_number', f"{difficulty:.1f}")
+    return (
+        '<!DOCTYPE html><html><head><title>Professor</title></head><body><div id="root"><main>'
+        + _element('num_ratings', f'<a href="#ratingsList">{num_of_ratings}ratings</a>')
+        + _element('rating', f"{rating:.1f}")
+        + _element('feedback', feedback)
+        + _element('tags', ''.join(_element('tag', x) for x in tags))
+        + '</main></div></body></html>'
+    )
+
+
+def write_rmp_fixtures(fixture_dir, school_id='1074', num_of_professors=200, max_reviews=60, seed=0):
+    """
+    :param fixture_dir: the fixture directory
+    :param school_id: the school the listing is recorded for
+    :param num_of_professors: professors in the listing
+    :param max_reviews: the most reviews any professor has
+    :param seed: seed of the random values
+    :return: the professor ids in the listing
+    """
+    rng = random.Random(seed)
+    professors = []
+    for i in range(num_of_professors):
+        professors.append({
+            'tDept': rng.choice(DEPARTMENTS), 'tSid': str(school_id), 'institution_name': 'Northeastern University',
+            'tFname': f"First{i}", 'tMiddlename': '', 'tLname': f"Last{i:04d}", 'tid': 100000 + i,
+            'tNumRatings': rng.randint(0, max_reviews), 'rating_class': 'good', 'contentType': 'TEACHER',
+            'categoryType': 'PROFESSOR', 'overall_rating': f"{rng.uniform(1, 5):.1f}",
+        })
+
+    # the listing, 20 professors a page
+    num_of_pages = max(1, math.ceil(num_of_professors / 20))
+    for page in range(1, num_of_pages + 1):
+        write_fixture(fixture_dir, RateMyProfApi.professor_list_url(school_id, page), json.dumps({
+            'professors': professors[(page - 1) * 20:page * 20],
+            'searchResultsTotal': num_of_professors,
+            'remaining': max(0, num_of_professors - page * 20),
+            'type': 'teacher',
+        }))
+
+    # every professor's reviews, 20 a page (newest first), and their profile page
+    for professor in professors:
+        tid, num_of_reviews = professor['tid'], professor['tNumRatings']
+        reviews = [{
+            'attendance': rng.choice(['Mandatory', 'Not Mandatory']), 'clarityColor': 'good', 'easyColor': 'average',
+            'helpColor': 'good', 'helpCount': rng.randint(0, 5), 'id': tid * 1000 + k,
+            'notHelpCount': rng.randint(0, 2), 'onlineClass': '', 'quality': 'awesome',
+            'rClarity': rng.randint(1, 5), 'rClass': f"CS{rng.randint(1000, 4999)}",
+            'rComments': ' '.join(rng.choice(TAGS).lower() for _ in range(12)),
+            'rDate': f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2015, 2024)}",
+            'rEasy': rng.randint(1, 5), 'rEasyString': '3.0', 'rErrorMsg': None, 'rHelpful': rng.randint(1, 5),
+            'rInterest': 'Really into it', 'rOverall': rng.randint(1, 5), 'rOverallString': '4.0', 'rStatus': 1,
+            'rTextBookUse': 'Yes', 'rTimestamp': 1500000000000 + k, 'rWouldTakeAgain': rng.choice(['Yes', 'No']),
+            'sId': int(school_id), 'takenForCredit': 'Yes', 'teacher': tid, 'teacherGrade': 'A',
+            'teacherRatingTags': rng.sample(TAGS, 2), 'unUsefulGrouping': 'people', 'usefulGrouping': 'people',
+        } for k in range(num_of_reviews)]
+        for page in range(1, max(1, math.ceil(num_of_reviews / 20)) + 1):
+            write_fixture(fixture_dir, RateMyProfApi.reviews_url(tid, page), json.dumps({
+                'ratings': reviews[(page - 1) * 20:page * 20],
+                'remaining': max(0, num_of_reviews - page * 20),
+            }))
+        write_fixture(fixture_dir, professor_url(tid), profile_page(
+            num_of_reviews, float(professor['overall_rating']), rng.random(), rng.uniform(1, 5),
+            rng.sample(TAGS, 3)))
+
+    return [x['tid'] for x in professors]
+
+
+def _bar_chart(chart_index, questions, professor_means, department_means):
+    # one chart laid out the way the extraction script's selectors walk it: the svg's fourth group holds the
+    # question labels (after six axis labels) as its fourth group and the bars as its fifth, three groups a bar
+    axis = ''.join(f"<g><text>{x}</text></g>" for x in ['1', '2', '3', '4', '5', ''])
+    labels = ''.join(f"<g><text>{x}</text></g>" for x in questions)
+    bars = ''.join(f"<g><text>{x:.1f}</text></g><g><rect></rect></g><g></g>"
+                   for x in professor_means + department_means)
+    svg = (f"<svg><g></g><g></g><g></g><g><g></g><g></g><g></g><g>{axis}{labels}</g><g>{bars}</g></g></svg>")
+    return (f'<div id="chart_{chart_index}"><div id="bar_mean_55_{chart_index}"><div><div><div>{svg}</div>'
+            f'</div></div></div></div>')
+
+
+def trace_report_page(details, charts):
+    """
+    :param details: the course details, as (key, value) pairs
+    :param charts: (questions, professor means, department means) of every chart
+    :return: the html of the report that sits inside a survey's contentFrame iframe
+    """
+    items = ''.join(f"<li><strong>{key}:</strong> {value}</li>" for key, value in details)
+    chart_divs = ''.join(_bar_chart(i + 1, *x) for i, x in enumerate(charts))
+    return (f'<!DOCTYPE html><html><body><ul class="list-unstyled">{items}</ul>'
+            f'<div id="chart_55">{chart_divs}</div></body></html>')
+
+
+def write_trace_fixtures(fixture_dir, num_of_surveys=50, seed=0):
+    """
+    :param fixture_dir: the fixture directory
+    :param num_of_surveys: survey pages to write
+    :param seed: seed of the random values
+    :return: the paths (under the replay server) of the survey pages, and the rows they should scrape to
+    """
+    rng = random.Random(seed)
+    directory = os.path.join(fixture_dir, TRACE_DIR)
+    os.makedirs(directory, exist_ok=True)
+
+    paths, rows = [], []
+    for i in range(num_of_surveys):
+        details = [('Instructor', f"Last{i % 40:04d}, First{i % 40}"), ('Course Title', f"Course {i % 25}"),
+                   ('Section', f"{i % 3 + 1:02d}"), ('Course ID', str(30000 + i))]
+        charts, row = [], {'Instructor': details[0][1], 'Course Title': details[1][1], 'Section': details[2][1],
+                           'Course ID': details[3][1]}
+        for _, questions in TRACE_CHARTS:
+            professor_means = [round(rng.uniform(2.5, 5), 1) for _ in questions]
+            department_means = [round(rng.uniform(3.5, 4.8), 1) for _ in questions]
+            charts.append((questions, professor_means, department_means))
+            for question, x, y in zip(questions, professor_means, department_means):
+                row[question] = round(x - y, 1)
+
+        # the survey page only frames the report, the same as the real one
+        with open(os.path.join(directory, f"report_{i:05d}.html"), 'w') as report_file:
+            report_file.write(trace_report_page(details, charts))
+        with open(os.path.join(directory, f"survey_{i:05d}.html"), 'w') as survey_file:
+            survey_file.write(f'<!DOCTYPE html><html><body><iframe id="contentFrame" name="contentFrame" '
+                              f'src="report_{i:05d}.html"></iframe></body></html>')
+        paths.append(f"/{TRACE_DIR}/survey_{i:05d}.html")
+        rows.append(row)
+
+    with open(os.path.join(directory, 'expected_rows.json'), 'w') as rows_file:
+        json.dump(rows, rows_file)
+    return paths, rows
+
+
+if __name__ == '__main__':
+
+    # python replay_fixtures.py [<fixture dir>]
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else 'replay_fixtures'
+    tids = write_rmp_fixtures(fixture_dir)
+    paths, _ = write_trace_fixtures(fixture_dir)
+    print(f"Wrote Fixtures for {len(tids)} Professors and {len(paths)} Surveys!")
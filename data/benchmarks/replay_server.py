@@ -0,0 +1,242 @@
+"""
+File: replay_server.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Local stub HTTP server replaying recorded Rate My Professor responses and static TRACE pages
+"""
+
+# import necessary libraries
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlsplit
+
+# run as a script, the shared modules under data/ have to be importable (a script importing this one has
+# already set that up)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.request_scheduler import RequestScheduler
+from common.transport import HttpTransport
+
+
+# recorded responses are kept by their url's path and query; trace pages are plain static files
+RESPONSES_DIR = 'responses'
+TRACE_DIR = 'trace'
+
+
+def url_target(url):
+    # the path and query of a url, which is all the replay server looks at
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def fixture_path(fixture_dir, url):
+    """
+    :param fixture_dir: the fixture directory
+    :param url: a url (on any host)
+    :return: the file the response to the url is recorded in
+    """
+    return os.path.join(fixture_dir, RESPONSES_DIR, quote(url_target(url), safe=''))
+
+
+def url_kind(url):
+    # which of the scraper's requests a url is, so latencies can be grouped by stage
+    path = urlsplit(url).path
+    if path.startswith('/filter/professor'):
+        return 'listing'
+    if path.startswith('/paginate/professors/ratings'):
+        return 'reviews'
+    if path.startswith('/professor/'):
+        return 'profile'
+    if path.startswith('/' + TRACE_DIR + '/'):
+        return 'trace'
+    return 'other'
+
+
+def write_fixture(fixture_dir, url, body):
+    """
+    :param fixture_dir: the fixture directory
+    :param url: the url the body was served for
+    :param body: the response body (bytes or str)
+    :return: null
+    """
+    path = fixture_path(fixture_dir, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as fixture_file:
+        fixture_file.write(body.encode('utf-8') if isinstance(body, str) else body)
+    os.replace(path + '.tmp', path)
+
+
+def record_fixtures(urls, fixture_dir, transport=None):
+    """ Fetches urls once from the real site and keeps their bodies for replaying
+    :param urls: the urls to record
+    :param fixture_dir: the fixture directory
+    :param transport: the HttpTransport to fetch with (a default one if not given)
+    :return: the number of responses recorded
+    """
+    transport = transport if transport is not None else HttpTransport()
+    urls = list(urls)
+    for url, body in zip(urls, transport.map(transport.get_content, urls)):
+        write_fixture(fixture_dir, url, body)
+    return len(urls)
+
+
+def fixtures_from_cache(cache_dir, fixture_dir):
+    """ Turns what a ResponseCache already holds from real scrapes into fixtures
+    :param cache_dir: a ResponseCache directory
+    :param fixture_dir: the fixture directory
+    :return: the number of responses copied
+    """
+    from common.response_cache import ResponseCache
+
+    cache = ResponseCache(cache_dir, offline=True)
+    urls = [url for url, in cache._db.execute("SELECT url FROM responses")]
+    copied = 0
+    for url in urls:
+        entry = cache.get(url)
+        if entry is not None:
+            write_fixture(fixture_dir, url, entry.body)
+            copied += 1
+    cache.close()
+    return copied
+
+
+class ReplayServer:
+    def __init__(self, fixture_dir: str, latency: float = 0, port: int = 0):
+        """
+        :param fixture_dir: directory holding the recorded responses and the static trace pages
+        :param latency: seconds every response is held back, to stand in for the network
+        :param port: port to listen on (any free one by default)
+        """
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.port = port
+
+        # what was asked for, so a benchmark can check it replayed what it thinks it did
+        self.hits = defaultdict(int)
+        self.misses = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def body_for(self, target):
+        """
+        :param target: the path and query of a request
+        :return: the recorded body and its content type, or None if nothing was recorded for it
+        """
+        path = urlsplit(target).path
+        if path.startswith('/' + TRACE_DIR + '/'):
+            file_path = os.path.normpath(os.path.join(self.fixture_dir, path.lstrip('/')))
+
+            # static pages never get served from outside of the trace directory
+            if not file_path.startswith(os.path.normpath(os.path.join(self.fixture_dir, TRACE_DIR)) + os.sep):
+                return None
+        else:
+            file_path = os.path.join(self.fixture_dir, RESPONSES_DIR, quote(target, safe=''))
+        if not os.path.isfile(file_path):
+            return None
+
+        with open(file_path, 'rb') as fixture_file:
+            body = fixture_file.read()
+        content_type = 'application/json' if body[:1] in (b'{', b'[') else 'text/html; charset=utf-8'
+        return body, content_type
+
+    def start(self):
+        # serve in a background thread until stop() is called
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if replay.latency:
+                    time.sleep(replay.latency)
+                found = replay.body_for(self.path)
+                with replay._lock:
+                    replay.hits[url_kind(self.path)] += 1
+                    if found is None:
+                        replay.misses.append(self.path)
+                if found is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, content_type = found
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class ReplayTransport(HttpTransport):
+    def __init__(self, base_url: str, max_workers: int = 8, cache=None, scheduler: RequestScheduler = None,
+                 metrics=None):
+        """
+        :param base_url: the replay server every request is sent to instead of its real host
+        :param max_workers: the most requests allowed in flight at once
+        :param cache: an optional ResponseCache
+        :param scheduler: a RequestScheduler (by default one without the per host rate limit, which would
+                          otherwise be all that gets measured)
+        :param metrics: an optional RunMetrics the requests are also recorded in
+        """
+        if scheduler is None:
+            scheduler = RequestScheduler(rate_per_host=1e9, burst=1e9, initial_concurrency=max_workers,
+                                         max_concurrency=max_workers)
+        super().__init__(max_workers, cache=cache, scheduler=scheduler, metrics=metrics)
+        self.base_url = base_url.rstrip('/')
+
+        # seconds each request took, grouped by url_kind
+        self.latencies = defaultdict(list)
+
+    def replay_url(self, url):
+        # the same request, sent to the replay server
+        return self.base_url + url_target(url)
+
+    def get(self, url):
+        start = time.perf_counter()
+        response = super().get(self.replay_url(url))
+        self.latencies[url_kind(url)].append(time.perf_counter() - start)
+        return response
+
+    def get_content(self, url):
+        return super().get_content(self.replay_url(url))
+
+
+if __name__ == '__main__':
+
+    # python replay_server.py <fixture dir> [port]
+    server = ReplayServer(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 8765).start()
+    print(f"Replaying {sys.argv[1]} on {server.base_url}!")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
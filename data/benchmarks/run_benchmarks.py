@@ -0,0 +1,323 @@
+"""
+File: run_benchmarks.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Throughput, latency and peak memory benchmarks of both scrapers and the cleaning step, run offline
+             against the replay server and kept across runs so regressions show up
+"""
+
+# import necessary libraries
+import datetime
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+sys.path.insert(0, os.path.join(HERE, '..', 'rmp'))
+sys.path.insert(0, os.path.join(HERE, '..', 'trace_survey'))
+
+from data_scrape_rmp import scrape_professor_profile
+from profile_extraction import LxmlBackend, SoupBackend, build_profile, lxml
+from ratemyprof_api import RateMyProfApi
+from replay_fixtures import write_rmp_fixtures, write_trace_fixtures
+from replay_server import RESPONSES_DIR, TRACE_DIR, ReplayServer, ReplayTransport
+from trace_cleaning import clean_section, raw_section_paths
+
+
+# where every run's results are appended (one json object a line)
+RESULTS_PATH = 'benchmark_results.jsonl'
+
+# a stage counts as regressed once it is this much slower (or bigger) than the previous run
+REGRESSION_THRESHOLD = 0.15
+
+
+class StageResult:
+    def __init__(self, name: str, items: int, seconds: float, latencies=None, peak_memory=None, note: str = None):
+        """
+        :param name: the stage
+        :param items: how many things (pages, reviews, surveys, rows) the stage got through
+        :param seconds: wall time of the stage
+        :param latencies: seconds of each request/item, if the stage has them
+        :param peak_memory: peak bytes allocated while the stage ran
+        :param note: why a stage was skipped, or anything else worth keeping with the result
+        """
+        self.name = name
+        self.items = items
+        self.seconds = seconds
+        self.latencies = list(latencies) if latencies is not None else []
+        self.peak_memory = peak_memory
+        self.note = note
+
+    def to_dict(self):
+        result = {'items': self.items, 'seconds': round(self.seconds, 4),
+                  'items_per_second': round(self.items / self.seconds, 2) if self.seconds else None,
+                  'peak_memory_mb': round(self.peak_memory / 1024 ** 2, 2) if self.peak_memory is not None else None}
+        if self.latencies:
+            p50, p95, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 95, 99])
+            result.update({'latency_p50_ms': round(p50, 3), 'latency_p95_ms': round(p95, 3),
+                           'latency_p99_ms': round(p99, 3)})
+        if self.note:
+            result['note'] = self.note
+        return result
+
+
+def measure(name, run, memory=True):
+    """
+    :param name: the stage
+    :param run: a function running the stage once and returning (items, latencies)
+    :param memory: run the stage a second time under tracemalloc for its peak memory
+    :return: a StageResult
+    """
+    # timed on its own, since tracing every allocation slows everything down
+    start = time.perf_counter()
+    items, latencies = run()
+    seconds = time.perf_counter() - start
+
+    peak_memory = None
+    if memory:
+        tracemalloc.start()
+        run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return StageResult(name, items, seconds, latencies, peak_memory)
+
+
+def benchmark_rmp(server, school_id='1074', max_workers=8):
+    """
+    :param server: a started ReplayServer with rate my professor fixtures
+    :param school_id: the school the fixtures were recorded for
+    :param max_workers: requests in flight at once
+    :return: StageResults of the listing, review and profile stages
+    """
+    results = []
+
+    def listing():
+        with ReplayTransport(server.base_url, max_workers) as transport:
+            professors = RateMyProfApi(school_id, transport=transport).scrape_professors()
+            return len(professors), transport.latencies['listing']
+
+    results.append(measure('rmp_listing', listing))
+    with ReplayTransport(server.base_url, max_workers) as transport:
+        tids = [x['tid'] for x in RateMyProfApi(school_id, transport=transport).scrape_professors()]
+
+    def reviews():
+        with ReplayTransport(server.base_url, max_workers) as transport:
+            reviews_lists = RateMyProfApi(school_id, transport=transport).create_reviews_lists(tids)
+            return sum(len(x) for x in reviews_lists), transport.latencies['reviews']
+
+    def profiles():
+        with ReplayTransport(server.base_url, max_workers) as transport:
+            transport.map(lambda tid: scrape_professor_profile(tid, transport), tids)
+            return len(tids), transport.latencies['profile']
+
+    results.append(measure('rmp_reviews', reviews))
+    results.append(measure('rmp_profiles', profiles))
+    return results
+
+
+def benchmark_parsers(fixture_dir, repeat=3):
+    """
+    :param fixture_dir: the fixture directory
+    :param repeat: how many times the pages are parsed (the fastest pass is kept)
+    :return: a StageResult per profile extraction backend
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, RESPONSES_DIR, '%2Fprofessor%2F*'))):
+        with open(path, encoding='utf-8', errors='replace') as page_file:
+            pages.append((os.path.basename(path).split('%2F')[-1], page_file.read()))
+
+    backends = [SoupBackend('html.parser')]
+    if lxml is not None:
+        backends += [SoupBackend('lxml'), LxmlBackend()]
+
+    results = []
+    for backend in backends:
+        label = f"{backend.name}_{backend.parser}" if isinstance(backend, SoupBackend) else backend.name
+
+        def parse():
+            latencies = []
+            for prof_id, html in pages:
+                start = time.perf_counter()
+                build_profile(prof_id, backend.extract(prof_id, html))
+                latencies.append(time.perf_counter() - start)
+            return len(pages), latencies
+
+        best = measure(f"parse_profile_{label}", parse)
+        for _ in range(repeat - 1):
+            result = measure(f"parse_profile_{label}", parse, memory=False)
+            if result.seconds < best.seconds:
+                result.peak_memory = best.peak_memory
+                best = result
+        results.append(best)
+    return results
+
+
+def benchmark_trace(server, paths):
+    """
+    :param server: a started ReplayServer with trace fixtures
+    :param paths: the survey pages to scrape (paths on the replay server)
+    :return: the StageResult of get_survey_content (skipped if no browser can be launched)
+    """
+    from playwright.sync_api import sync_playwright
+    from data_scrape_trace import get_survey_content
+
+    expected_path = os.path.join(server.fixture_dir, TRACE_DIR, 'expected_rows.json')
+    with open(expected_path) as rows_file:
+        expected_rows = json.load(rows_file)
+
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=True)
+        except Exception as e:
+            return StageResult('trace_get_survey_content', 0, 0, note=f"skipped: {str(e).splitlines()[0]}")
+        context = browser.new_context()
+
+        def surveys():
+            latencies, rows = [], []
+            for path in paths:
+                start = time.perf_counter()
+                rows.append(get_survey_content(context, server.base_url + path))
+                latencies.append(time.perf_counter() - start)
+            if rows != expected_rows[:len(rows)]:
+                raise ValueError("get_survey_content scraped different rows than the fixtures hold")
+            return len(rows), latencies
+
+        result = measure('trace_get_survey_content', surveys)
+        context.close()
+        browser.close()
+    return result
+
+
+def benchmark_cleaning(paths):
+    """
+    :param paths: raw trace survey csvs
+    :return: the StageResult of cleaning them (written to a temporary directory, never over the real outputs)
+    """
+    def clean():
+        latencies, surveys = [], 0
+        with tempfile.TemporaryDirectory() as output_dir:
+            for path in paths:
+                start = time.perf_counter()
+                surveys += clean_section(path, output_dir)[2]
+                latencies.append(time.perf_counter() - start)
+        return surveys, latencies
+
+    return measure('trace_cleaning', clean)
+
+
+def git_commit():
+    # the commit the results were measured at
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=HERE).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_results(path=RESULTS_PATH):
+    """
+    :param path: the results file
+    :return: every run stored so far, oldest first
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def save_result(run, path=RESULTS_PATH):
+    # runs are only ever appended
+    with open(path, 'a') as results_file:
+        results_file.write(json.dumps(run) + '\n')
+
+
+def regressions(run, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    :param run: this run's results
+    :param previous: an earlier run's results
+    :param threshold: the relative change that counts as a regression
+    :return: a list of (stage, metric, before, after) that got worse by more than the threshold
+    """
+    worse = []
+    for stage, metrics in run['stages'].items():
+        before = previous['stages'].get(stage)
+        if before is None:
+            continue
+
+        # lower is better for everything except throughput
+        for metric, higher_is_better in [('items_per_second', True), ('latency_p95_ms', False),
+                                         ('peak_memory_mb', False)]:
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                worse.append((stage, metric, old, new))
+    return worse
+
+
+def run_benchmarks(fixture_dir='replay_fixtures', sections=None, latency=0.0, max_workers=8):
+    """
+    :param fixture_dir: the fixture directory (synthetic fixtures are written into it if it's empty)
+    :param sections: raw trace survey csvs for the cleaning stage (the repo's own by default)
+    :param latency: seconds the replay server holds back every response
+    :param max_workers: requests in flight at once for the rate my professor stages
+    :return: this run's results
+    """
+    if not os.path.isdir(os.path.join(fixture_dir, RESPONSES_DIR)):
+        write_rmp_fixtures(fixture_dir)
+    if not os.path.isdir(os.path.join(fixture_dir, TRACE_DIR)):
+        write_trace_fixtures(fixture_dir)
+    survey_paths = sorted(f"/{TRACE_DIR}/{os.path.basename(x)}"
+                          for x in glob.glob(os.path.join(fixture_dir, TRACE_DIR, 'survey_*.html')))
+    if sections is None:
+        sections = raw_section_paths(os.path.join(HERE, '..', 'trace_survey', 'trace_data_stores'))
+
+    results = []
+    with ReplayServer(fixture_dir, latency=latency) as server:
+        results += benchmark_rmp(server, max_workers=max_workers)
+        results.append(benchmark_trace(server, survey_paths))
+        if server.misses:
+            print(f"{len(server.misses)} requests had no fixture, e.g. {server.misses[0]}")
+    results += benchmark_parsers(fixture_dir)
+    results.append(benchmark_cleaning(sections))
+
+    return {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+            'latency': latency, 'max_workers': max_workers,
+            'stages': {x.name: x.to_dict() for x in results}}
+
+
+if __name__ == '__main__':
+
+    # python run_benchmarks.py [<fixture dir> [<results file>]]
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else 'replay_fixtures'
+    results_path = sys.argv[2] if len(sys.argv) > 2 else RESULTS_PATH
+
+    run = run_benchmarks(fixture_dir)
+    for stage, metrics in run['stages'].items():
+        if 'note' in metrics:
+            print(f"{stage:<32} {metrics['note']}")
+            continue
+        latency = f"p50 {metrics['latency_p50_ms']:8.2f}ms p95 {metrics['latency_p95_ms']:8.2f}ms" \
+            if 'latency_p50_ms' in metrics else ''
+        print(f"{stage:<32} {metrics['items']:>7} in {metrics['seconds']:7.3f}s "
+              f"{metrics['items_per_second']:>10.1f}/s {metrics['peak_memory_mb']:>8.2f}MB {latency}")
+
+    # compare against the last run before this one is stored
+    previous = load_results(results_path)
+    if previous:
+        worse = regressions(run, previous[-1])
+        for stage, metric, old, new in worse:
+            print(f"Regression: {stage} {metric} went from {old} to {new}")
+        if not worse:
+            print(f"No regressions since {previous[-1]['commit']} ({previous[-1]['timestamp']})")
+    save_result(run, results_path)
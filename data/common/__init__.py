@@ -0,0 +1,6 @@
+"""
+File: __init__.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Modules both scrapers share: the http transport, request scheduling, the response cache and run metrics
+"""
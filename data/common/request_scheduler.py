@@ -0,0 +1,264 @@
+"""
+File: request_scheduler.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Per-host rate limiting, retries with jittered backoff and AIMD concurrency control for the scrapers
+"""
+
+# import necessary libraries
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+
+# responses that mean "slow down / try again", as opposed to a real answer
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RequestFailed(Exception):
+    def __init__(self, url, attempts: int, reason: str):
+
+        # the url we gave up on, how many times we tried and what happened the last time
+        self.url = url
+        self.attempts = attempts
+        self.reason = reason
+
+    def __str__(self):
+
+        return f"Gave up on {self.url} after {self.attempts} attempts ({self.reason})"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        """
+        :param rate: tokens (requests) added per second
+        :param burst: most tokens that can be saved up
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # take one token, sleeping until there is one
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AimdLimiter:
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, decrease: float = 0.5,
+                 latency_target: float = 2.0):
+        """
+        :param initial: requests allowed in flight at the start
+        :param minimum: the limit never drops below this
+        :param maximum: the limit never grows past this
+        :param decrease: factor the limit is multiplied by when the server pushes back
+        :param latency_target: seconds; slower responses count as push back too
+        """
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_target = latency_target
+
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        # wait for a free slot under the current limit
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, ok: bool, latency: float):
+        """
+        :param ok: False if the server throttled, errored or dropped the request
+        :param latency: seconds the request took
+        :return: null
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if ok and latency <= self.latency_target:
+
+                # additive increase: about +1 for every window's worth of good responses
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            # multiplicative decrease, at most once per latency target so one burst of errors
+            # (from requests that were all in flight together) only counts once
+            elif now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_decrease = now
+            self._condition.notify_all()
+
+
+class RequestScheduler:
+    def __init__(self, rate_per_host: float = 20, burst: float = 20, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 60, initial_concurrency: int = 4,
+                 max_concurrency: int = 32, latency_target: float = 2.0, metrics=None):
+        """
+        :param rate_per_host: most requests per second sent to any one host
+        :param burst: requests a host can get at once after being idle
+        :param max_retries: retries of a throttled/failed request before giving up
+        :param backoff_base: seconds of the first backoff (doubled on every retry, with jitter)
+        :param backoff_max: longest single backoff
+        :param initial_concurrency: requests in flight at the start
+        :param max_concurrency: the most requests ever in flight
+        :param latency_target: seconds; slower responses shrink concurrency
+        :param metrics: an optional RunMetrics every retry is recorded in
+        """
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = AimdLimiter(initial_concurrency, 1, max_concurrency, latency_target=latency_target)
+
+        self.retries = 0
+        self.metrics = metrics
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        # one token bucket per host
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate_per_host, self.burst)
+            return self._buckets[host]
+
+    def backoff(self, attempt, response=None):
+        """
+        :param attempt: how many times the request has failed so far (1 for the first failure)
+        :param response: the failed response, if there was one (its Retry-After is honored)
+        :return: seconds to wait before the next attempt
+        """
+        if response is not None and response.headers.get('Retry-After'):
+            retry_after = response.headers['Retry-After']
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after).timestamp()
+                    return min(self.backoff_max, max(0.0, retry_at - time.time()))
+                except (TypeError, ValueError):
+                    pass
+
+        # "full jitter" exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def send(self, session, url, headers=None, timeout=30):
+        """
+        :param session: the requests session to send with
+        :param url: a url
+        :param headers: extra request headers
+        :param timeout: seconds to wait on a single attempt
+        :return: the first response that isn't a throttle/server error
+        """
+        bucket = self._bucket(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            bucket.acquire()
+            self.limiter.acquire()
+            start = time.monotonic()
+            response = None
+            ok = False
+            try:
+                # the body is read inside get, so a dropped or truncated one (ChunkedEncodingError,
+                # ContentDecodingError) lands here as well and is retried like any other network error
+                response = session.get(url, headers=headers, timeout=timeout)
+                ok = response.status_code not in RETRY_STATUSES
+                reason = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                reason = type(e).__name__
+            finally:
+                # the slot is given back however the attempt ended, or the limiter would leak it for good
+                self.limiter.release(ok, time.monotonic() - start)
+
+            if ok:
+                return response
+            if attempt > self.max_retries:
+                raise RequestFailed(url, attempt, reason)
+
+            with self._lock:
+                self.retries += 1
+            if self.metrics is not None:
+                self.metrics.retry(url, reason)
+            time.sleep(self.backoff(attempt, response))
+
+
+if __name__ == '__main__':
+
+    # check against a local stub that throttles: every fourth path gets a 429 (with Retry-After) the first time
+    # it's asked for and the next one a 503, some responses are slow; exits non zero if anything is off
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    RETRY_AFTER = 0.2
+    requested = {}
+    requested_lock = threading.Lock()
+
+    class ThrottlingHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            index = int(self.path.strip('/'))
+            with requested_lock:
+                times = requested.setdefault(index, [])
+                times.append(time.monotonic())
+                first = len(times) == 1
+            if first and index % 4 in (0, 1):
+                self.send_response(429 if index % 4 == 0 else 503)
+                if index % 4 == 0:
+                    self.send_header('Retry-After', str(RETRY_AFTER))
+                self.end_headers()
+                return
+            time.sleep(0.3 if index % 10 == 9 else 0.01)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    scheduler = RequestScheduler(rate_per_host=200, burst=20, backoff_base=0.05, max_concurrency=16,
+                                 latency_target=0.2)
+    with requests.Session() as session, ThreadPoolExecutor(16) as pool:
+        start = time.monotonic()
+        urls = [f'http://127.0.0.1:{server.server_port}/{i}' for i in range(300)]
+        statuses = list(pool.map(lambda url: scheduler.send(session, url).status_code, urls))
+    server.shutdown()
+
+    print(f"{statuses.count(200)} of {len(urls)} OK in {time.monotonic() - start:.1f}s with "
+          f"{scheduler.retries} retries; concurrency limit ended at {scheduler.limiter.limit:.1f}")
+
+    # every request ends up answered, each throttled one is retried exactly once, and never before Retry-After
+    problems = []
+    if statuses.count(200) != len(urls):
+        problems.append(f"{len(urls) - statuses.count(200)} requests never succeeded")
+    throttled = [i for i in range(len(urls)) if i % 4 in (0, 1)]
+    if scheduler.retries != len(throttled):
+        problems.append(f"{scheduler.retries} retries for {len(throttled)} throttled requests")
+    early = [i for i in throttled if i % 4 == 0 and requested[i][1] - requested[i][0] < RETRY_AFTER]
+    if early:
+        problems.append(f"{len(early)} requests retried before their Retry-After, e.g. /{early[0]}")
+    if problems:
+        raise SystemExit('\n'.join(problems))
+    print("Backoff Check Passed!")
@@ -0,0 +1,224 @@
+"""
+File: response_cache.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Persistent on-disk cache of scraped responses (TTL, LRU size bound and ETag/Last-Modified revalidation)
+"""
+
+# import necessary libraries
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+# last access times are kept in memory and written to the index this many at a time (and on every write)
+LAST_USED_BATCH = 500
+
+class CacheMiss(Exception):
+    def __init__(self, url):
+
+        # the url that was asked for while the cache was offline
+        self.url = url
+
+    def __str__(self):
+
+        return f"No cached response for {self.url} and the cache is in offline mode"
+
+
+class CachedResponse:
+    def __init__(self, url: str, body: bytes, etag, last_modified, fetched_at: float):
+        self.url = url
+        self.body = body
+
+        # validators the server gave us, sent back on revalidation
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def age(self):
+        # seconds since the response was downloaded (or last revalidated)
+        return time.time() - self.fetched_at
+
+
+class ResponseCache:
+    def __init__(self, directory: str = "rmp_cache", ttl: float = 24 * 60 * 60, max_bytes: int = 2 * 1024 ** 3,
+                 offline: bool = False):
+        """
+        :param directory: where the bodies and the index are kept
+        :param ttl: seconds a response is served without asking the server again
+        :param max_bytes: total size of stored bodies before the least recently used ones get evicted
+        :param offline: only ever serve from the cache (raises CacheMiss instead of going to the network)
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+        # one index for the whole cache; bodies live next to it, named by the hash of their url
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, "
+            "fetched_at REAL, last_used REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+        # a hit only notes when it happened (key -> time) instead of committing, and the total size is kept
+        # running instead of summed again on every write
+        self._last_used = {}
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key_for(url):
+        # content address of a url
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url):
+        """
+        :param url: a url
+        :return: the CachedResponse for the url, or None if it isn't cached
+        """
+        key = self.key_for(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, fetched_at, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        # bodies are only ever swapped in whole, so they can be read without holding the lock; one that was
+        # removed by hand is a miss
+        try:
+            with open(self._body_path(key), "rb") as body_file:
+                body = body_file.read()
+        except FileNotFoundError:
+            with self._lock:
+                if self._db.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount:
+                    self._total -= row[3]
+                self._last_used.pop(key, None)
+                self._db.commit()
+            return None
+
+        with self._lock:
+            self._last_used[key] = time.time()
+            if len(self._last_used) >= LAST_USED_BATCH:
+                self._flush_last_used()
+                self._db.commit()
+
+        return CachedResponse(url, body, row[0], row[1], row[2])
+
+    def _flush_last_used(self):
+        # write the noted access times to the index (lock must be held; the caller commits)
+        if self._last_used:
+            self._db.executemany("UPDATE responses SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._last_used.items()])
+            self._last_used.clear()
+
+    def is_fresh(self, entry):
+        """
+        :param entry: a CachedResponse
+        :return: True if the entry can be served without revalidating it
+        """
+        return self.offline or entry.age() < self.ttl
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        :param url: a url
+        :param body: the raw response body
+        :param etag: the ETag header of the response (if any)
+        :param last_modified: the Last-Modified header of the response (if any)
+        :return: null
+        """
+        key = self.key_for(url)
+        path = self._body_path(key)
+        now = time.time()
+        with self._lock:
+
+            # write to a temporary file first so a crash never leaves half a body behind
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as body_file:
+                body_file.write(body)
+            os.replace(temp_path, path)
+
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, etag, last_modified, now, now, len(body)),
+            )
+            self._last_used.pop(key, None)
+            self._total += len(body) - (old[0] if old is not None else 0)
+            self._evict()
+            self._db.commit()
+
+    def touch(self, url):
+        """
+        :param url: a url the server just told us hasn't changed (304)
+        :return: null
+        """
+        now = time.time()
+        key = self.key_for(url)
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ?, last_used = ? WHERE key = ?", (now, now, key))
+            self._last_used.pop(key, None)
+            self._db.commit()
+
+    def expire(self, url_prefix):
+        """
+        :param url_prefix: a url (or the start of several urls) whose cached copies must be revalidated next time
+        :return: null
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET fetched_at = 0 WHERE substr(url, 1, ?) = ?", (len(url_prefix), url_prefix)
+            )
+            self._db.commit()
+
+    def _evict(self):
+        # drop the least recently used bodies until we are back under the size bound (lock must be held)
+        if self._total <= self.max_bytes:
+            return
+
+        # the noted hits have to be in the index for it to know what was used least recently
+        self._flush_last_used()
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total -= size
+            if self._total <= self.max_bytes:
+                break
+
+    def size(self):
+        # total bytes of stored bodies
+        with self._lock:
+            return self._total
+
+    def clear(self):
+        # remove every cached response
+        with self._lock:
+            for (key,) in self._db.execute("SELECT key FROM responses").fetchall():
+                try:
+                    os.remove(self._body_path(key))
+                except FileNotFoundError:
+                    pass
+            self._db.execute("DELETE FROM responses")
+            self._last_used.clear()
+            self._total = 0
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_last_used()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,267 @@
+"""
+File: run_metrics.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Per-stage timing, request latency histograms and progress/ETA reporting for scraping runs
+"""
+
+# import necessary libraries
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+# upper bounds (milliseconds) of the latency histogram buckets; the last bucket holds everything slower
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+
+# seconds between snapshots written to the metrics file (and progress lines printed)
+REPORT_INTERVAL = 10
+
+
+def request_kind(url):
+    # what a request is for, by the first part of its path ("filter", "paginate", "professor", ...)
+    parts = [x for x in urlparse(url).path.split('/') if x]
+    return parts[0] if parts else urlparse(url).netloc
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        # add one latency
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, q):
+        """
+        :param q: the percentile (0 to 100)
+        :return: the upper bound (ms) of the bucket the percentile falls in (the max for the last bucket)
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(LATENCY_BUCKETS_MS[i], self.max) if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 2) if self.count else None,
+            'min_ms': round(self.min, 2) if self.min is not None else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max, 2) if self.max is not None else None,
+            'buckets': {(f"le_{bound}" if i < len(LATENCY_BUCKETS_MS) else 'inf'): count
+                        for i, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + [None], self.counts)) if count},
+        }
+
+
+class StageProgress:
+    def __init__(self):
+        # items done out of an optional total, and seconds spent in the stage (summed across threads)
+        self.done = 0
+        self.total = None
+        self.seconds = 0.0
+        self.calls = 0
+        self.started = None
+
+    def rate(self, now):
+        # items per second since the stage's first item
+        if not self.done or self.started is None or now <= self.started:
+            return None
+        return self.done / (now - self.started)
+
+    def eta(self, now):
+        # seconds left at the current rate, if the total is known
+        rate = self.rate(now)
+        if self.total is None or not rate:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def to_dict(self, now):
+        rate = self.rate(now)
+        eta = self.eta(now)
+        return {'done': self.done, 'total': self.total, 'seconds': round(self.seconds, 3), 'calls': self.calls,
+                'items_per_second': round(rate, 2) if rate else None, 'eta_seconds': round(eta, 1) if eta else None}
+
+
+class RunMetrics:
+    def __init__(self, path: str = None, run_name: str = None, interval: float = REPORT_INTERVAL,
+                 verbose: bool = True):
+        """
+        :param path: a json lines file the metrics are appended to (kept in memory only if None)
+        :param run_name: what every line of this run is tagged with (the start time by default)
+        :param interval: seconds between snapshots while the run goes on
+        :param verbose: print a progress line (with eta) per stage every snapshot
+        """
+        self.path = path
+        self.run_name = run_name if run_name is not None else time.strftime('%Y%m%d-%H%M%S')
+        self.interval = interval
+        self.verbose = verbose
+        self.started = time.time()
+
+        # per request kind: latencies, bytes, errors and retries; per stage: progress and time spent
+        self.latencies = {}
+        self.bytes = {}
+        self.errors = {}
+        self.retries = {}
+        self.cache_hits = {}
+        self.stages = {}
+
+        self._lock = threading.Lock()
+        self._last_report = time.monotonic()
+        if path is not None and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _stage(self, name):
+        # the progress of a stage, made the first time it's used (call with the lock held)
+        if name not in self.stages:
+            self.stages[name] = StageProgress()
+        return self.stages[name]
+
+    def observe_request(self, url, seconds, size=0, ok=True, cached=False):
+        """
+        :param url: the url that was requested
+        :param seconds: how long it took (retries and backoff included)
+        :param size: bytes of the response body
+        :param ok: whether it succeeded
+        :param cached: whether it was answered from the response cache
+        :return: null
+        """
+        kind = request_kind(url)
+        with self._lock:
+            self.latencies.setdefault(kind, LatencyHistogram()).observe(seconds)
+            self.bytes[kind] = self.bytes.get(kind, 0) + size
+            if not ok:
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+            if cached:
+                self.cache_hits[kind] = self.cache_hits.get(kind, 0) + 1
+        self.maybe_report()
+
+    def observe(self, kind, seconds):
+        # a latency that isn't an http request (a browser page, a survey read)
+        with self._lock:
+            self.latencies.setdefault(kind, LatencyHistogram()).observe(seconds)
+        self.maybe_report()
+
+    def retry(self, url, reason):
+        """
+        :param url: the url being retried
+        :param reason: why the last attempt failed
+        :return: null
+        """
+        kind = request_kind(url)
+        with self._lock:
+            self.retries[kind] = self.retries.get(kind, 0) + 1
+        self.emit('retry', kind=kind, url=url, reason=reason)
+
+    @contextmanager
+    def stage(self, name):
+        """ Times a block of work as part of a stage
+        :param name: the stage ("listing", "parse", "dataframe", ...)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stage = self._stage(name)
+                stage.seconds += elapsed
+                stage.calls += 1
+
+    def set_total(self, name, total):
+        # how many items a stage will get through, for its eta
+        with self._lock:
+            self._stage(name).total = total
+
+    def add_total(self, name, total):
+        # more items for a stage whose total grows as it is discovered (pages of a term, say)
+        with self._lock:
+            stage = self._stage(name)
+            stage.total = (stage.total or 0) + total
+
+    def add_items(self, name, count=1):
+        # items a stage finished
+        with self._lock:
+            stage = self._stage(name)
+            if stage.started is None:
+                stage.started = time.time()
+            stage.done += count
+        self.maybe_report()
+
+    def snapshot(self):
+        # everything measured so far
+        now = time.time()
+        with self._lock:
+            return {
+                'elapsed_seconds': round(now - self.started, 1),
+                'stages': {name: x.to_dict(now) for name, x in self.stages.items()},
+                'requests': {kind: dict(x.to_dict(), bytes=self.bytes.get(kind, 0),
+                                        errors=self.errors.get(kind, 0), retries=self.retries.get(kind, 0),
+                                        cache_hits=self.cache_hits.get(kind, 0))
+                             for kind, x in self.latencies.items()},
+            }
+
+    def progress_lines(self):
+        # one human readable line per stage
+        lines = []
+        for name, stage in self.snapshot()['stages'].items():
+            done = f"{stage['done']}/{stage['total']}" if stage['total'] is not None else str(stage['done'])
+            rate = f"{stage['items_per_second']}/s" if stage['items_per_second'] else '-'
+            eta = f"ETA {stage['eta_seconds']:.0f}s" if stage['eta_seconds'] is not None else ''
+            lines.append(f"[{name}] {done} ({rate}, {stage['seconds']:.1f}s spent) {eta}".rstrip())
+        return lines
+
+    def emit(self, event, **fields):
+        """
+        :param event: what happened ("snapshot", "retry", "stage", ...)
+        :param fields: anything else about it
+        :return: null
+        """
+        if self.path is None:
+            return
+        line = json.dumps(dict({'time': round(time.time(), 3), 'run': self.run_name, 'event': event}, **fields),
+                          default=str)
+        with self._lock:
+            with open(self.path, 'a') as metrics_file:
+                metrics_file.write(line + '\n')
+
+    def report(self):
+        # write a snapshot, and print where every stage is at
+        self._last_report = time.monotonic()
+        self.emit('snapshot', **self.snapshot())
+        if self.verbose:
+            for line in self.progress_lines():
+                print(line)
+
+    def maybe_report(self):
+        # report if the last one was long enough ago
+        if time.monotonic() - self._last_report >= self.interval:
+            with self._lock:
+                if time.monotonic() - self._last_report < self.interval:
+                    return
+                self._last_report = time.monotonic()
+            self.report()
+
+    def close(self):
+        # the final snapshot of the run
+        self.emit('summary', **self.snapshot())
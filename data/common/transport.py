@@ -0,0 +1,193 @@
+"""
+File: transport.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Shared, connection-pooled and concurrent HTTP transport for the Rate My Professor scrapers
+"""
+
+# import necessary libraries
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .request_scheduler import RequestFailed, RequestScheduler
+from .response_cache import CacheMiss
+from .run_metrics import RunMetrics
+
+
+class HttpTransport:
+    def __init__(self, max_workers: int = 8, timeout: float = 30, cache=None, scheduler: RequestScheduler = None,
+                 metrics: RunMetrics = None):
+        """
+        :param max_workers: the most requests allowed in flight at once
+        :param timeout: seconds to wait on a single request before giving up
+        :param cache: an optional ResponseCache that bodies are served from and saved to
+        :param scheduler: rate limits, retries and adapts concurrency (a default one is made if not given)
+        :param metrics: where request latencies, bytes and retries are recorded (kept in memory if not given)
+        """
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else RunMetrics(verbose=False)
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler(
+            initial_concurrency=min(4, self.max_workers), max_concurrency=self.max_workers)
+        if self.scheduler.metrics is None:
+            self.scheduler.metrics = self.metrics
+
+        # one session for every request so tcp/tls connections are kept alive and reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # the worker pool is only created once something is actually fetched concurrently
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get(self, url):
+        """
+        :param url: a url
+        :return: the response for the url
+        """
+        start = time.perf_counter()
+        try:
+            response = self.scheduler.send(self.session, url, timeout=self.timeout)
+        except RequestFailed:
+            self.metrics.observe_request(url, time.perf_counter() - start, ok=False)
+            raise
+        self.metrics.observe_request(url, time.perf_counter() - start, len(response.content),
+                                     ok=response.status_code < 400)
+        return response
+
+    def get_content(self, url):
+        """
+        :param url: a url
+        :return: the raw body of the response (from the cache when it is still fresh)
+        """
+        if self.cache is None:
+            return self.get(url).content
+
+        # serve straight from disk while the cached copy is within its ttl
+        start = time.perf_counter()
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.metrics.observe_request(url, time.perf_counter() - start, len(entry.body), cached=True)
+            return entry.body
+        if self.cache.offline:
+            raise CacheMiss(url)
+
+        # otherwise ask the server whether our copy is still good
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        try:
+            response = self.scheduler.send(self.session, url, headers=headers, timeout=self.timeout)
+        except RequestFailed:
+            self.metrics.observe_request(url, time.perf_counter() - start, ok=False)
+            raise
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(url)
+            self.metrics.observe_request(url, time.perf_counter() - start, len(entry.body), cached=True)
+            return entry.body
+        self.metrics.observe_request(url, time.perf_counter() - start, len(response.content),
+                                     ok=response.status_code < 400)
+
+        # only successful responses are worth keeping
+        if response.status_code == 200:
+            self.cache.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.content
+
+    def get_text(self, url):
+        """
+        :param url: a url
+        :return: the decoded body of the response
+        """
+        return self.get_content(url).decode("utf-8", errors="replace")
+
+    def get_json(self, url):
+        """
+        :param url: a url
+        :return: the json body of the response as python objects
+        """
+        # a cut off or error page can still come back as a 200, so a body that isn't json gets re-requested
+        attempt = 0
+        while True:
+            attempt += 1
+            content = self.get_content(url)
+            try:
+                return json.loads(content)
+            except ValueError:
+                if self.cache is not None:
+                    self.cache.expire(url)
+                if attempt > self.scheduler.max_retries or (self.cache is not None and self.cache.offline):
+                    raise RequestFailed(url, attempt, "response was not valid json")
+                time.sleep(self.scheduler.backoff(attempt))
+
+    def map(self, func, items):
+        """
+        :param func: a function taking one item
+        :param items: the items to run the function over
+        :return: a list of the results, in the same order as the items
+        """
+        items = list(items)
+
+        # nothing to gain from the pool for zero or one item
+        if len(items) <= 1 or self.max_workers == 1:
+            return [func(item) for item in items]
+
+        return list(self._get_executor().map(func, items))
+
+    def _get_executor(self):
+        # the worker pool, created the first time it is needed
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def imap(self, func, items, window=None):
+        """
+        :param func: a function taking one item
+        :param items: the items to run the function over
+        :param window: how many results may be worked on ahead of the consumer (max_workers by default)
+        :return: a generator of the results, in the same order as the items
+        """
+        window = window if window is not None else self.max_workers
+        executor = self._get_executor()
+
+        # only keep a bounded number of items in flight so a slow consumer doesn't pile up results
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def map_json(self, urls):
+        """
+        :param urls: the urls to fetch
+        :return: a list of json bodies, in the same order as the urls
+        """
+        return self.map(self.get_json, urls)
+
+    def close(self):
+        # shut down the worker pool and release the pooled connections
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self.session.close()
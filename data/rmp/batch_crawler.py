@@ -0,0 +1,184 @@
+"""
+File: batch_crawler.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Crawls many schools at once over one shared worker/connection pool, writing a shard per school
+"""
+
+# import necessary libraries
+import csv
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.response_cache import ResponseCache
+from common.transport import HttpTransport
+from data_scrape_rmp import PROFILE_COLUMNS, professor_rows, scrape_professor_rows
+from ratemyprof_api import RateMyProfApi
+from review_store import ReviewStore
+from rmp_output import CheckpointedCsvWriter
+
+
+# columns of the combined index written next to the shards
+INDEX_COLUMNS = ['school_id', 'institution_name', 'status', 'professors', 'reviews', 'shard', 'seconds', 'error']
+
+
+class CrawlProgress:
+    def __init__(self, school_ids: list):
+
+        # school id -> [professors done, professors total, reviews, status]
+        self.schools = {str(x): [0, None, 0, 'waiting'] for x in school_ids}
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, school_id, done=0, total=None, reviews=0, status=None):
+        """
+        :param school_id: the school that made progress
+        :param done: professors just finished
+        :param total: the school's number of professors (once known)
+        :param reviews: reviews just stored
+        :param status: new status of the school
+        :return: null
+        """
+        with self._lock:
+            school = self.schools[str(school_id)]
+            school[0] += done
+            school[2] += reviews
+            if total is not None:
+                school[1] = total
+            if status is not None:
+                school[3] = status
+            print(self.line(school_id))
+
+    def line(self, school_id):
+        # one line progress report for a school
+        done, total, reviews, status = self.schools[str(school_id)]
+        total_text = '?' if total is None else total
+        return f"[{time.monotonic() - self.started:7.1f}s] School {school_id}: {status}, " \
+               f"{done}/{total_text} professors, {reviews} reviews"
+
+
+def crawl_school(school_id, transport, output_dir, review_store, progress, batch_size=50):
+    """
+    :param school_id: the rate my professor school id
+    :param transport: the HttpTransport shared by every school
+    :param output_dir: where the school's shard is written
+    :param review_store: the ReviewStore shared by every school (partitioned by school)
+    :param progress: the CrawlProgress to report to
+    :param batch_size: professors per written batch
+    :return: a row of the combined index for this school
+    """
+    start = time.monotonic()
+    shard_path = os.path.join(output_dir, f"SchoolID_{school_id}.csv")
+    progress.update(school_id, status='listing')
+
+    # the listing goes over the shared pool like every other request, and is consumed a batch at a time
+    # so profiles and reviews are being fetched while later listing pages are still coming in
+    school = RateMyProfApi(school_id, transport=transport)
+    professors = school.iter_professors()
+
+    # each school streams into its own shard and can resume on its own
+    writer = CheckpointedCsvWriter(shard_path + '.partial', os.path.join(output_dir, f"SchoolID_{school_id}.json"),
+                                   list(professor_rows([]).columns) + PROFILE_COLUMNS)
+
+    num_of_professors = 0
+    reviews = 0
+    institution_name = ''
+    while True:
+        school_df = professor_rows(list(islice(professors, batch_size)))
+        if school_df.empty:
+            break
+        num_of_professors += len(school_df)
+        institution_name = school_df['Institution Name'].iloc[0]
+
+        scrape_df = school_df[~school_df['ID'].isin(writer.done_tids)]
+        scraped_df = scrape_professor_rows(school, scrape_df)
+        batch_reviews = [review for reviews_list in scraped_df['Reviews'] for review in reviews_list]
+        review_store.append(batch_reviews)
+        writer.write_rows(scraped_df)
+        reviews += len(batch_reviews)
+        progress.update(school_id, done=len(school_df), total=school.num_of_professors, reviews=len(batch_reviews),
+                        status='scraping')
+
+    writer.finish(shard_path)
+    progress.update(school_id, status='done')
+
+    return {'school_id': school_id, 'institution_name': institution_name, 'status': 'done',
+            'professors': num_of_professors, 'reviews': reviews, 'shard': os.path.basename(shard_path),
+            'seconds': round(time.monotonic() - start, 1), 'error': ''}
+
+
+def write_index(path, rows):
+    """
+    :param path: path of the combined index csv
+    :param rows: one index row per school
+    :return: null
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=INDEX_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    os.replace(temp_path, path)
+
+
+def crawl_schools(school_ids, output_dir='rmp_schools', max_workers=16, schools_at_once=4, cache=None,
+                  batch_size=50):
+    """
+    :param school_ids: the rate my professor school ids to crawl
+    :param output_dir: directory for the per-school shards, the combined index and the review store
+    :param max_workers: requests in flight across every school together
+    :param schools_at_once: schools being worked on at the same time (they all share max_workers)
+    :param cache: an optional ResponseCache shared by every school
+    :param batch_size: professors per written batch
+    :return: the rows of the combined index
+    """
+    school_ids = [str(x) for x in school_ids]
+    os.makedirs(output_dir, exist_ok=True)
+    index_path = os.path.join(output_dir, 'index.csv')
+
+    # one connection pool, worker pool and rate limiter for every school, so the total load on the site
+    # is bounded no matter how many schools are going
+    transport = HttpTransport(max_workers, cache=cache)
+    review_store = ReviewStore(os.path.join(output_dir, 'reviews'))
+    progress = CrawlProgress(school_ids)
+    index_rows = {}
+    index_lock = threading.Lock()
+
+    def run(school_id):
+        # crawl one school and record it in the index, even if it fails
+        try:
+            row = crawl_school(school_id, transport, output_dir, review_store, progress, batch_size)
+        except Exception as e:
+            progress.update(school_id, status='failed')
+            row = {'school_id': school_id, 'status': 'failed', 'error': repr(e)}
+        with index_lock:
+            index_rows[school_id] = row
+            write_index(index_path, [index_rows[x] for x in school_ids if x in index_rows])
+        return row
+
+    # the school threads only orchestrate; the actual requests all run on the transport's shared pool
+    with ThreadPoolExecutor(max_workers=max(1, schools_at_once)) as schools_pool:
+        rows = list(schools_pool.map(run, school_ids))
+
+    transport.close()
+    return rows
+
+
+if __name__ == '__main__':
+
+    # python batch_crawler.py <school id> [<school id> ...]
+    if len(sys.argv) < 2:
+        print("Usage: python batch_crawler.py <school id> [<school id> ...]")
+        sys.exit(1)
+
+    cache = ResponseCache('rmp_cache')
+    index = crawl_schools(sys.argv[1:], cache=cache)
+    cache.close()
+    print(f"Crawled {sum(row['status'] == 'done' for row in index)} of {len(index)} Schools!")
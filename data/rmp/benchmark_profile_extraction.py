@@ -0,0 +1,84 @@
+"""
+File: benchmark_profile_extraction.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Micro-benchmark of the profile page extraction backends on saved pages
+"""
+
+# import necessary libraries
+import glob
+import os
+import sqlite3
+import sys
+import time
+
+from profile_extraction import LxmlBackend, SoupBackend, build_profile, lxml
+
+
+def load_saved_pages(path):
+    """
+    :param path: a ResponseCache directory or a directory of saved .html profile pages
+    :return: a list of (professor id, html) pairs
+    """
+    pages = []
+
+    # pages the scraper already cached
+    index_path = os.path.join(path, 'index.sqlite')
+    if os.path.exists(index_path):
+        db = sqlite3.connect(index_path)
+        for key, url in db.execute("SELECT key, url FROM responses WHERE url LIKE '%.com/professor/%'"):
+            with open(os.path.join(path, key[:2], key), 'rb') as body_file:
+                pages.append((url.rstrip('/').split('/')[-1], body_file.read().decode('utf-8', errors='replace')))
+        db.close()
+
+    # pages saved by hand (named <professor id>.html)
+    for file_path in sorted(glob.glob(os.path.join(path, '*.html'))):
+        with open(file_path, encoding='utf-8', errors='replace') as html_file:
+            pages.append((os.path.splitext(os.path.basename(file_path))[0], html_file.read()))
+
+    return pages
+
+
+def benchmark_backend(backend, pages, repeat=5):
+    """
+    :param backend: an extraction backend
+    :param pages: the (professor id, html) pairs to parse
+    :param repeat: how many times to parse the whole set (the best run is kept)
+    :return: the best seconds per page, and the number of pages the backend failed on
+    """
+    best = None
+    failures = 0
+    for _ in range(repeat):
+        failures = 0
+        start = time.perf_counter()
+        for prof_id, html in pages:
+            try:
+                build_profile(prof_id, backend.extract(prof_id, html))
+            except Exception:
+                failures += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / len(pages), failures
+
+
+if __name__ == '__main__':
+
+    # saved pages come from the scraper's cache unless another directory is given
+    pages = load_saved_pages(sys.argv[1] if len(sys.argv) > 1 else 'rmp_cache')
+    if not pages:
+        print("No saved profile pages found!")
+        sys.exit(1)
+    print(f"Benchmarking on {len(pages)} Saved Pages!")
+
+    backends = [SoupBackend('html.parser')]
+    if lxml is not None:
+        backends += [SoupBackend('lxml'), LxmlBackend()]
+
+    # report each backend against the original (beautiful soup with the pure python parser)
+    baseline = None
+    for backend in backends:
+        per_page, failures = benchmark_backend(backend, pages)
+        baseline = per_page if baseline is None else baseline
+        label = f"{backend.name} ({backend.parser})" if isinstance(backend, SoupBackend) else backend.name
+        print(f"{label:<20} {per_page * 1000:8.3f} ms/page {baseline / per_page:6.1f}x  {failures} failed")
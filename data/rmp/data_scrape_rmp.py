@@ -15,113 +15,146 @@ from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+import os
 import requests
+import sys
 import warnings
+from itertools import islice
+
+# run as a script, the shared modules under data/ have to be importable (a script importing this one has
+# already set that up)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.request_scheduler import RequestFailed
+from common.response_cache import CacheMiss, ResponseCache
+from common.run_metrics import RunMetrics
 from ratemyprof_api import RateMyProfApi
+from incremental_refresh import (SNAPSHOT_COLUMNS, load_listing_snapshot, save_listing_snapshot, diff_listing,
+                                 load_previous_ids, iter_previous_output)
+from review_store import ReviewStore
+from rmp_output import CheckpointedCsvWriter
+from profile_extraction import BS4_PARSER, ProfilePageError, SoupBackend, build_profile, extract_profile
+
+
+# failures that belong to one professor (a page that 404s, never parses or never comes back as json); that
+# professor is skipped instead of the whole run, and picked up again by a later one
+PROFESSOR_ERRORS = (RequestFailed, ProfilePageError, CacheMiss)
 
 
 # getting the html file using requests and returning a beautiful soup object
-def requests_get_soup(url):
+def requests_get_soup(url, transport=None, metrics=None):
     """
     :param url: a url
+    :param transport: a shared HttpTransport to reuse pooled connections (plain requests if not given)
+    :param metrics: where the request and the parse are timed (the transport's if not given)
     :return: html content
     """
+    if metrics is None:
+        metrics = transport.metrics if transport is not None else RunMetrics(verbose=False)
 
     # get the html contents
-    feed = requests.get(url)
-    html = feed.text
+    if transport is not None:
+        html = transport.get_text(url)
+    else:
+        start = time.perf_counter()
+        feed = requests.get(url)
+        metrics.observe_request(url, time.perf_counter() - start, len(feed.content), ok=feed.ok)
+        html = feed.text
 
     # turn into a beautiful soup object
-    temp_soup = BeautifulSoup(html)
+    with metrics.stage('parse'):
+        temp_soup = BeautifulSoup(html, BS4_PARSER)
 
     return temp_soup
 
 
-# scrape specific professor number of ratings and average rating at a specific university
-def scrape_professor_avg_rating_and_num_ratings(prof_id):
+# the url of a professor's page
+def professor_url(prof_id):
     """
     :param prof_id: the professor id
-    :return: average rating, number of ratings for a given professor
+    :return: the url of the professor's rate my professor page
     """
+    return f"https://www.ratemyprofessors.com/professor/{prof_id}"
 
-    # temporary url
-    prof_url = f"https://www.ratemyprofessors.com/professor/{prof_id}"
 
-    # get soup object to parse it
-    soup = requests_get_soup(prof_url)
+# scrape every value we need off of a professor's page with a single request
+def scrape_professor_profile(prof_id, transport=None):
+    """
+    :param prof_id: the professor id
+    :param transport: a shared HttpTransport to reuse pooled connections
+    :return: a ProfessorProfile holding the ratings, would take again, difficulty and tags for a given professor
+    """
+
+    # temporary url
+    prof_url = professor_url(prof_id)
 
-    # find the number of ratings; if there are none specify 0
-    num_of_ratings = soup.find('div', class_="RatingValue__NumRatings-qw8sqy-0 jMkisx").find(
-        'a').get_text(strip=True)
-    if num_of_ratings == 'Add a rating.':
-        num_of_ratings = 0
+    # get the html once and pull every value out of it (lxml when available, beautiful soup otherwise)
+    if transport is not None:
+        html = transport.get_text(prof_url)
+        metrics = transport.metrics
     else:
-        num_of_ratings = int(num_of_ratings.split('ratings')[0])
+        metrics = RunMetrics(verbose=False)
+        start = time.perf_counter()
+        feed = requests.get(prof_url)
+        metrics.observe_request(prof_url, time.perf_counter() - start, len(feed.content), ok=feed.ok)
+        html = feed.text
 
-    # find the average rating; specify if it's N/A
-    rating = soup.find('div', class_='RatingValue__Numerator-qw8sqy-2 liyUjw').get_text(strip=True)
-    if rating != 'N/A':
-        rating = float(rating)
+    with metrics.stage('parse'):
+        profile = extract_profile(prof_id, html)
+    metrics.add_items('profiles')
+    return profile
 
-    return num_of_ratings, rating
 
+# parse an already downloaded professor page into a profile
+def parse_professor_profile(prof_id, soup):
+    """
+    :param prof_id: the professor id
+    :param soup: the beautiful soup object of the professor's page
+    :return: a ProfessorProfile for the given professor
+    """
+    return build_profile(prof_id, SoupBackend().extract(prof_id, soup))
 
-# scrape specific professor wta percentage and level of difficulty at a specific university
-def scrape_professor_wta_percentage_and_lvl_of_difficulty(prof_id):
+
+# scrape specific professor number of ratings and average rating at a specific university
+def scrape_professor_avg_rating_and_num_ratings(prof_id, profile=None):
     """
     :param prof_id: the professor id
-    :return: would take again percentage, level of difficulty for a given professor
+    :param profile: an already scraped ProfessorProfile (the page is fetched if not given)
+    :return: average rating, number of ratings for a given professor
     """
 
-    # temporary url
-    prof_url = f"https://www.ratemyprofessors.com/professor/{prof_id}"
-
-    # get soup object to parse it
-    soup = requests_get_soup(prof_url)
-
-    # find the would you take again percentage and level of difficulty (if they exist)
-    terms = soup.find('div',
-                      class_='TeacherFeedback__StyledTeacherFeedback-gzhlj7-0 cxVUGc').findAll('div',
-                      class_="FeedbackItem__FeedbackNumber-uof32n-1 kkESWs")
-    percentage = terms[0].get_text(strip=True)
-    if percentage != 'N/A':
-        percentage = float(percentage[:-1]) / 100
-
-    # check if they actually have a level of difficulty
-    if len(terms) == 2:
-        lvl = float(terms[1].get_text(strip=True))
-    else:
-        lvl = 'N/A'
+    if profile is None:
+        profile = scrape_professor_profile(prof_id)
 
-    return percentage, lvl
+    return profile.num_of_ratings, profile.overall_rating
 
 
-def scrape_professor_tags(prof_id):
+# scrape specific professor wta percentage and level of difficulty at a specific university
+def scrape_professor_wta_percentage_and_lvl_of_difficulty(prof_id, profile=None):
     """
     :param prof_id: the professor id
-    :return: a list of tags for the given professor
+    :param profile: an already scraped ProfessorProfile (the page is fetched if not given)
+    :return: would take again percentage, level of difficulty for a given professor
     """
 
-    # temporary url
-    prof_url = f"https://www.ratemyprofessors.com/professor/{prof_id}"
+    if profile is None:
+        profile = scrape_professor_profile(prof_id)
 
-    # get soup object to parse it
-    soup = requests_get_soup(prof_url)
+    return profile.would_take_again, profile.difficulty
 
-    # get the tags associated with the professor
-    tags = []
-    tags_soup = soup.find('div', class_='TeacherTags__TagsContainer-sc-16vmh1y-0 dbxJaW')
 
-    # check if we actually have tags
-    if tags_soup:
+def scrape_professor_tags(prof_id, profile=None):
+    """
+    :param prof_id: the professor id
+    :param profile: an already scraped ProfessorProfile (the page is fetched if not given)
+    :return: a list of tags for the given professor
+    """
 
-        # if we do, then get them
-        teacher_tags = tags_soup.findAll(class_='Tag-bs9vf4-0 hHOVKF')
-        for tag in teacher_tags:
-            temp_statement = tag.get_text(strip=True)
-            tags.append(temp_statement)
+    if profile is None:
+        profile = scrape_professor_profile(prof_id)
 
-    return tags
+    return profile.tags
 
 
 def scrape_professor_reviews(universityobject, prof_id):
@@ -137,42 +170,236 @@ def scrape_professor_reviews(universityobject, prof_id):
     return reviews
 
 
-if __name__ == '__main__':
+# columns filled in by scrape_professor_rows (Reviews goes to the review store, not the csv)
+PROFILE_COLUMNS = ['Number of Ratings', 'Average Rating (Out of 5)', 'Would Take Again (Percent)',
+                   'Level of Difficulty (Out of 5)', 'Popular Tags']
+
+
+# turn the listing from the api into the professor rows we scrape
+def professor_rows(professor_data):
+    """
+    :param professor_data: the raw professor dicts returned by RateMyProfApi
+    :return: a dataframe of the listing columns we keep, renamed
+    """
 
-    # scrape professors from Northeastern
-    NortheasternUniversity = RateMyProfApi('696')
-    professor_data = NortheasternUniversity.get_professors()
-    
     # get temporary professor data
-    prof_df = pd.DataFrame(professor_data)
-    print("Grabbed Temporary Data!")
-    
-    # filter data we want to keep (for now)
-    final_df = prof_df[['tFname', 'tMiddlename', 'tLname', 'tid', 'tDept', 'institution_name', 'tSid']]
-    print("Filtered the Data!")
+    prof_df = pd.DataFrame(professor_data, columns=['tFname', 'tMiddlename', 'tLname', 'tid', 'tDept',
+                                                    'institution_name', 'tSid'])
 
     # change column names
-    final_df.columns = ['First Name', 'Middle Name', 'Last Name', 'ID', 'Department',
-                        'Institution Name', 'Institution ID']
-
-    # Remove Leandra Smollin and Jack Witkin (They have no data)
-    final_df = final_df[~final_df['ID'].isin([1047708, 2180974])]
-    print("Removed Unnecessary Teachers!")
-    
-    # get all the content we need
-    final_df[['Number of Ratings', 'Average Rating (Out of 5)']] = final_df['ID'].apply(lambda x:
-     pd.Series(scrape_professor_avg_rating_and_num_ratings(x)))
-    print("Scraped Number of Ratings and Average Rating!")
-
-    final_df[['Would Take Again (Percent)', 'Level of Difficulty (Out of 5)']] = final_df['ID'].apply(lambda x:
-     pd.Series(scrape_professor_wta_percentage_and_lvl_of_difficulty(x)))
-    print("Scraped Would Take Again Percentage and Level of Difficulty!")
-    
-    final_df['Popular Tags'] = final_df['ID'].apply(lambda x: scrape_professor_tags(x))
-    print("Scraped Popular Tags")
- 
-    final_df['Reviews'] = final_df['ID'].apply(lambda x: scrape_professor_reviews(NortheasternUniversity, x))
+    prof_df.columns = ['First Name', 'Middle Name', 'Last Name', 'ID', 'Department',
+                       'Institution Name', 'Institution ID']
+
+    return prof_df
+
+
+# log a professor that couldn't be scraped and count it in the run's metrics
+def skip_professor(metrics, prof_id, error):
+    """
+    :param metrics: the run's RunMetrics
+    :param prof_id: the professor id
+    :param error: what went wrong
+    :return: null
+    """
+    print(f"Skipping Professor {prof_id}: {error}")
+    metrics.add_items('skipped')
+    metrics.emit('skipped', tid=int(prof_id), reason=str(error))
+
+
+# scrape the profile and review columns for a set of professor rows
+def scrape_professor_rows(universityobject, rows_df, max_reviews=None):
+    """
+    :param universityobject: the instantiated object for a specific university
+    :param rows_df: the professor rows (with an 'ID' column) to scrape
+    :param max_reviews: optional list (one per row) capping how many of the newest reviews to fetch
+    :return: a copy of the rows with the profile and review columns filled in (without professors that failed)
+    """
+    rows_df = rows_df.copy()
+    max_reviews = list(max_reviews) if max_reviews is not None else [None] * len(rows_df)
+
+    # nothing to scrape (e.g. an incremental run where nobody changed)
+    if rows_df.empty:
+        for column in PROFILE_COLUMNS + ['Reviews']:
+            rows_df[column] = pd.Series(dtype=object)
+        return rows_df
+
+    # get all the content we need (each professor's page is only downloaded and parsed once)
+    # pages are fetched concurrently over the api's shared connection pool, in the same order as the rows
+    transport = universityobject.transport
+    metrics = transport.metrics
+    metrics.add_total('profiles', len(rows_df))
+    def profile_or_error(prof_id):
+        try:
+            return scrape_professor_profile(prof_id, transport)
+        except PROFESSOR_ERRORS as e:
+            return e
+
+    with metrics.stage('profiles'):
+        profiles = pd.Series(transport.map(profile_or_error, rows_df['ID']), index=rows_df.index, dtype=object)
+    print("Scraped Professor Profiles!")
+
+    # professors whose page failed are left out of the batch
+    failed = profiles.apply(lambda x: isinstance(x, Exception))
+    for prof_id, error in zip(rows_df.loc[failed, 'ID'], profiles[failed]):
+        skip_professor(metrics, prof_id, error)
+    max_reviews = [x for x, ok in zip(max_reviews, ~failed) if ok]
+    rows_df, profiles = rows_df[~failed].copy(), profiles[~failed]
+    if rows_df.empty:
+        for column in PROFILE_COLUMNS + ['Reviews']:
+            rows_df[column] = pd.Series(dtype=object)
+        return rows_df
+
+    # filling in the columns is dataframe work, timed apart from the network
+    with metrics.stage('dataframe'):
+        rows_df[['Number of Ratings', 'Average Rating (Out of 5)']] = profiles.apply(lambda x:
+         pd.Series(scrape_professor_avg_rating_and_num_ratings(x.ratemyprof_id, x)))
+        print("Scraped Number of Ratings and Average Rating!")
+
+        rows_df[['Would Take Again (Percent)', 'Level of Difficulty (Out of 5)']] = profiles.apply(lambda x:
+         pd.Series(scrape_professor_wta_percentage_and_lvl_of_difficulty(x.ratemyprof_id, x)))
+        print("Scraped Would Take Again Percentage and Level of Difficulty!")
+
+        rows_df['Popular Tags'] = profiles.apply(lambda x: scrape_professor_tags(x.ratemyprof_id, x))
+        print("Scraped Popular Tags")
+
+    # crawl every professor's reviews at once so all of their pages share the worker pool; if one of them fails,
+    # each professor is fetched on their own (pages already downloaded come from the cache) to find who it was
+    try:
+        reviews_lists = universityobject.create_reviews_lists(rows_df['ID'], max_reviews)
+    except PROFESSOR_ERRORS:
+        reviews_lists = []
+        for prof_id, limit in zip(rows_df['ID'], max_reviews):
+            try:
+                reviews_lists.append(universityobject.create_reviews_lists([prof_id], [limit])[0])
+            except PROFESSOR_ERRORS as e:
+                skip_professor(metrics, prof_id, e)
+                reviews_lists.append(e)
+    rows_df['Reviews'] = pd.Series(reviews_lists, index=rows_df.index, dtype=object)
+    rows_df = rows_df[~rows_df['Reviews'].apply(lambda x: isinstance(x, Exception))]
     print("Scraped Reviews!")
-     
-    # export our scraped RateMyProfessor Data as a CSV File
-    final_df.to_csv('northeastern_rmp_data.csv', index=False)
+
+    return rows_df
+
+
+if __name__ == '__main__':
+
+    # where the results (and the listing values they were scraped from) are kept between runs
+    output_path = 'northeastern_rmp_data.csv'
+    snapshot_path = 'northeastern_rmp_snapshot.csv'
+
+    # rows are streamed into the partial file in batches; the checkpoint lets an interrupted run resume
+    partial_path = output_path + '.partial'
+    checkpoint_path = 'northeastern_rmp_checkpoint.json'
+    batch_size = 50
+
+    # rebuild everything with --full, otherwise only re-scrape professors whose listing changed
+    previous_ids = None if '--full' in sys.argv else load_previous_ids(output_path)
+    snapshot = load_listing_snapshot(snapshot_path) if previous_ids is not None else {}
+    if previous_ids is None:
+        previous_ids = set()
+
+    # keep every downloaded page on disk so reruns (and partial reruns) don't have to hit the network again
+    cache = ResponseCache('rmp_cache', ttl=24 * 60 * 60)
+
+    # the listing is what tells us what changed, so it always gets revalidated
+    cache.expire("http://www.ratemyprofessors.com/filter/professor/")
+
+    # request latencies, bytes, retries and per stage progress go to a metrics file while the crawl runs
+    metrics = RunMetrics('rmp_metrics.jsonl')
+
+    # scrape professors from Northeastern (nothing is downloaded until the listing is iterated)
+    NortheasternUniversity = RateMyProfApi('696', cache=cache, metrics=metrics)
+
+    # reviews go into the partitioned review table; a full rebuild starts it over
+    review_store = ReviewStore('rmp_reviews')
+
+    # open (or resume) the streamed output
+    output_columns = list(professor_rows([]).columns) + PROFILE_COLUMNS
+    writer = CheckpointedCsvWriter(partial_path, checkpoint_path, output_columns)
+    if writer.is_resuming():
+        print(f"Resuming After {len(writer.done_tids)} Finished Professors!")
+    elif '--full' in sys.argv:
+        review_store.clear()
+
+    # the listing streams in page by page, and each batch of professors is scraped while later listing pages
+    # are still downloading; only the snapshot values of the listing are held on to
+    listing = []
+    keep_ids = set()
+    skipped_ids = set()
+    num_new, num_changed, num_done = 0, 0, 0
+    professors = NortheasternUniversity.iter_professors()
+    while True:
+        professor_data = list(islice(professors, batch_size))
+        if not professor_data:
+            break
+        listing.extend({column: x[column] for column in SNAPSHOT_COLUMNS} for x in professor_data)
+
+        # get the professor rows we keep from this part of the listing
+        batch_df = professor_rows(professor_data)
+
+        # Remove Leandra Smollin and Jack Witkin (They have no data)
+        batch_df = batch_df[~batch_df['ID'].isin([1047708, 2180974])]
+
+        # figure out who is new or changed since the last run (everyone is new without a snapshot);
+        # unchanged professors are copied over from the last run at the end
+        changes = diff_listing(professor_data, snapshot)
+        keep_ids.update(tid for tid in changes.unchanged if tid in previous_ids)
+        num_new += len(changes.new)
+        num_changed += len(changes.changed)
+        batch_df = batch_df[~batch_df['ID'].isin(keep_ids | writer.done_tids)]
+
+        # changed professors must not be answered from the cache's stale copies, and if they only gained
+        # ratings just the newest pages are needed (the store already has the rest)
+        max_reviews = []
+        for tid in batch_df['ID']:
+            if tid in changes.changed:
+                cache.expire(professor_url(tid))
+                cache.expire(RateMyProfApi.reviews_url(tid, ''))
+            max_reviews.append(changes.changed.get(tid) if tid in previous_ids else None)
+
+        scraped_df = scrape_professor_rows(NortheasternUniversity, batch_df, max_reviews)
+
+        # skipped professors are never checkpointed as done and keep their last run's row (if they had one);
+        # they're left out of the snapshot so the next run scrapes them again
+        scraped_ids = set(scraped_df['ID'])
+        skipped = set(batch_df['ID']) - scraped_ids
+        skipped_ids |= skipped
+        keep_ids.update(skipped & previous_ids)
+
+        # reviews land in the store before the rows are checkpointed, so a resumed run never skips them; a
+        # professor fetched in full replaces everything stored for them
+        with metrics.stage('store'):
+            review_store.delete_teachers(NortheasternUniversity.UniversityId,
+                                         [tid for tid, x in zip(batch_df['ID'], max_reviews)
+                                          if x is None and tid in scraped_ids])
+            review_store.append([review for reviews in scraped_df['Reviews'] for review in reviews])
+            writer.write_rows(scraped_df)
+        num_done += len(professor_data)
+        print(f"Went Through {num_done} of {NortheasternUniversity.num_of_professors} Listed Professors!")
+
+    print(f"{num_new} New, {num_changed} Changed and {len(keep_ids)} Unchanged Professors!")
+    if skipped_ids:
+        print(f"Skipped {len(skipped_ids)} Professors that Failed; the next run tries them again.")
+
+    # copy unchanged professors over from the last run a chunk at a time
+    if keep_ids - writer.done_tids:
+        for previous_df in iter_previous_output(output_path, batch_size):
+            kept_df = previous_df[previous_df['ID'].isin(keep_ids - writer.done_tids)]
+
+            # outputs from before the review store still carry their reviews in a column
+            if 'Reviews' in kept_df.columns:
+                review_store.append([review for reviews in kept_df['Reviews'] for review in reviews])
+            writer.write_rows(kept_df)
+        print("Copied Unchanged Professors!")
+
+    # export our scraped RateMyProfessor Data as a CSV File (and what it was scraped from for next time)
+    writer.finish(output_path)
+    save_listing_snapshot(snapshot_path, [x for x in listing if x['tid'] not in skipped_ids])
+
+    # one rewrite of the review partition per run, which also drops the reviews of professors fetched in full
+    with metrics.stage('compact'):
+        review_store.compact(NortheasternUniversity.UniversityId)
+    NortheasternUniversity.transport.close()
+    cache.close()
+    metrics.report()
+    metrics.close()
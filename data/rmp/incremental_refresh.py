@@ -0,0 +1,130 @@
+"""
+File: incremental_refresh.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Works out which professors changed since the last Rate My Professor run so only they get re-scraped
+"""
+
+# import necessary libraries
+import ast
+import csv
+import os
+
+import pandas as pd
+
+
+# the listing values we compare run to run
+SNAPSHOT_COLUMNS = ['tid', 'tNumRatings', 'overall_rating']
+
+# columns of the rmp output that hold python lists (Reviews only in outputs from before the review store)
+LIST_COLUMNS = ['Popular Tags', 'Reviews']
+
+
+class ListingChanges:
+    def __init__(self):
+
+        # tids we have never scraped before
+        self.new = []
+
+        # tid -> number of new ratings to fetch (None when the whole review list has to be re-crawled)
+        self.changed = {}
+
+        # tids whose listing values are exactly the same as last time
+        self.unchanged = []
+
+        # tids that were in the last snapshot but aren't listed anymore
+        self.removed = []
+
+
+def load_listing_snapshot(path):
+    """
+    :param path: path of the snapshot csv written by the last run
+    :return: a dict of tid -> (number of ratings, overall rating); empty if there is no snapshot yet
+    """
+    if not os.path.exists(path):
+        return {}
+
+    snapshot = {}
+    with open(path, newline='') as csvfile:
+        for row in csv.DictReader(csvfile):
+            snapshot[int(row['tid'])] = (int(row['tNumRatings']), row['overall_rating'])
+
+    return snapshot
+
+
+def save_listing_snapshot(path, professors):
+    """
+    :param path: path of the snapshot csv
+    :param professors: the raw professor dicts returned by RateMyProfApi
+    :return: null
+    """
+
+    # write next to the old snapshot and swap, so a crash never leaves us without one
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=SNAPSHOT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for professor in professors:
+            writer.writerow(professor)
+    os.replace(temp_path, path)
+
+
+def diff_listing(professors, snapshot):
+    """
+    :param professors: the raw professor dicts returned by RateMyProfApi
+    :param snapshot: the dict returned by load_listing_snapshot
+    :return: a ListingChanges splitting the professors into new, changed and unchanged
+    """
+    changes = ListingChanges()
+    seen = set()
+    for professor in professors:
+        tid = int(professor['tid'])
+        seen.add(tid)
+        num_of_ratings = int(professor['tNumRatings'])
+        overall_rating = str(professor['overall_rating'])
+
+        if tid not in snapshot:
+            changes.new.append(tid)
+            continue
+
+        old_num_of_ratings, old_overall_rating = snapshot[tid]
+        if num_of_ratings == old_num_of_ratings and overall_rating == old_overall_rating:
+            changes.unchanged.append(tid)
+
+        # more ratings than before: only the newest ones need fetching
+        elif num_of_ratings > old_num_of_ratings:
+            changes.changed[tid] = num_of_ratings - old_num_of_ratings
+
+        # ratings were removed or edited, so we can't tell which pages moved; get them all again
+        else:
+            changes.changed[tid] = None
+
+    changes.removed = [tid for tid in snapshot if tid not in seen]
+
+    return changes
+
+
+def load_previous_ids(path):
+    """
+    :param path: path of the rmp csv written by the last run
+    :return: the set of professor ids in it; None if there isn't one
+    """
+    if not os.path.exists(path):
+        return None
+
+    # only the id column is read, the reviews stay on disk
+    return set(pd.read_csv(path, usecols=['ID'])['ID'])
+
+
+def iter_previous_output(path, chunksize=500):
+    """
+    :param path: path of the rmp csv written by the last run
+    :param chunksize: number of professors per chunk
+    :return: a generator of dataframes with their list columns parsed back into lists
+    """
+    for previous_df in pd.read_csv(path, chunksize=chunksize):
+        for column in LIST_COLUMNS:
+            if column in previous_df.columns:
+                previous_df[column] = previous_df[column].apply(
+                    lambda x: ast.literal_eval(x) if isinstance(x, str) else [])
+        yield previous_df
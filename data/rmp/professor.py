@@ -1,5 +1,11 @@
+# import necessary libraries
+import numpy as np
+import pandas as pd
+
 
 class Professor:
+    __slots__ = ('ratemyprof_id', 'name', 'first_name', 'last_name', 'num_of_ratings', 'overall_rating')
+
     def __init__(self, ratemyprof_id: int, first_name: str, last_name: str, num_of_ratings: int, overall_rating):
         self.ratemyprof_id = ratemyprof_id
 
@@ -13,3 +19,107 @@ class Professor:
 
         else:
             self.overall_rating = float(overall_rating)
+
+
+class ProfessorProfile:
+    __slots__ = ('ratemyprof_id', 'num_of_ratings', 'overall_rating', 'would_take_again', 'difficulty', 'tags')
+
+    def __init__(self, ratemyprof_id: int, num_of_ratings: int, overall_rating, would_take_again, difficulty,
+                 tags: list):
+        self.ratemyprof_id = ratemyprof_id
+
+        # values scraped off of the professor's page ('N/A' when the page doesn't have them)
+        self.num_of_ratings = num_of_ratings
+        self.overall_rating = overall_rating
+        self.would_take_again = would_take_again
+        self.difficulty = difficulty
+        self.tags = tags
+
+
+def name_key(name):
+    # names are matched case insensitively and regardless of extra whitespace
+    return ' '.join(str(name).split()).casefold()
+
+
+class ProfessorTable:
+    __slots__ = ('tids', 'first_names', 'middle_names', 'last_names', 'departments', 'num_of_ratings',
+                 'overall_ratings', '_by_tid', '_by_last_name', '_by_name')
+
+    def __init__(self, professors=()):
+        """
+        :param professors: professor dicts as they come back from the listing api
+        """
+        professors_df = pd.DataFrame(list(professors)).reindex(
+            columns=['tid', 'tFname', 'tMiddlename', 'tLname', 'tDept', 'tNumRatings', 'overall_rating'])
+
+        # one typed array per field instead of one object per professor; departments repeat a lot so
+        # they are stored as codes into a small list of names
+        self.tids = pd.to_numeric(professors_df['tid'], errors='coerce').fillna(-1).to_numpy(np.int64)
+        self.first_names = professors_df['tFname'].fillna('').astype(str).to_numpy(object)
+        self.middle_names = professors_df['tMiddlename'].fillna('').astype(str).to_numpy(object)
+        self.last_names = professors_df['tLname'].fillna('').astype(str).to_numpy(object)
+        self.departments = pd.Categorical(professors_df['tDept'].fillna('').astype(str))
+        self.num_of_ratings = pd.to_numeric(professors_df['tNumRatings'], errors='coerce').fillna(0) \
+            .to_numpy(np.int32)
+        self.overall_ratings = pd.to_numeric(professors_df['overall_rating'], errors='coerce').to_numpy(np.float32)
+
+        # hash indexes from each key to the rows that have it (a name can belong to several professors)
+        first_names = pd.Series(self.first_names, dtype=object)
+        last_names = pd.Series(self.last_names, dtype=object)
+        first_last = first_names + ' ' + last_names
+        first_middle_last = first_names + ' ' + pd.Series(self.middle_names, dtype=object) + ' ' + last_names
+        self._by_tid = dict(zip(self.tids.tolist(), range(len(self.tids))))
+        self._by_last_name = _group_rows(_name_keys(last_names))
+        self._by_name = _group_rows(pd.concat([_name_keys(first_last), _name_keys(first_middle_last)]))
+
+    def __len__(self):
+        return len(self.tids)
+
+    def __contains__(self, tid):
+        return int(tid) in self._by_tid
+
+    def professor(self, row):
+        """
+        :param row: a row of the table
+        :return: the Professor in that row
+        """
+        return Professor(int(self.tids[row]), self.first_names[row], self.last_names[row],
+                         int(self.num_of_ratings[row]), self.overall_ratings[row])
+
+    def by_tid(self, tid):
+        """
+        :param tid: a rate my professor id
+        :return: the Professor with that id, or None
+        """
+        row = self._by_tid.get(int(tid))
+        return self.professor(row) if row is not None else None
+
+    def by_last_name(self, last_name):
+        """
+        :param last_name: a last name (case insensitive)
+        :return: every Professor with that last name
+        """
+        return [self.professor(row) for row in self._by_last_name.get(name_key(last_name), [])]
+
+    def by_name(self, name):
+        """
+        :param name: "first last" or "first middle last" (case insensitive)
+        :return: every Professor with that name
+        """
+        return [self.professor(row) for row in self._by_name.get(name_key(name), [])]
+
+
+def _name_keys(names):
+    # name_key over a whole column at once
+    return names.str.split().str.join(' ').str.casefold()
+
+
+def _group_rows(keys):
+    # key -> array of the rows holding it, built by sorting once instead of looping in python
+    keys_df = pd.DataFrame({'key': keys.to_numpy(), 'row': keys.index.to_numpy()}).drop_duplicates()
+    keys_df = keys_df[keys_df['key'] != ''].sort_values(['key', 'row'])
+    if keys_df.empty:
+        return {}
+    key_values = keys_df['key'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, key_values[1:] != key_values[:-1]])
+    return dict(zip(key_values[starts].tolist(), np.split(keys_df['row'].to_numpy(np.int32), starts[1:])))
@@ -0,0 +1,192 @@
+"""
+File: profile_extraction.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Pluggable extraction of the values we need from Rate My Professor profile pages
+"""
+
+# import necessary libraries
+from bs4 import BeautifulSoup
+
+from professor import ProfessorProfile
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+
+# every element we read off of a profile page, as (tag, exact class attribute); None means any tag
+PROFILE_SELECTORS = {
+    'num_ratings': ('div', 'RatingValue__NumRatings-qw8sqy-0 jMkisx'),
+    'rating': ('div', 'RatingValue__Numerator-qw8sqy-2 liyUjw'),
+    'feedback': ('div', 'TeacherFeedback__StyledTeacherFeedback-gzhlj7-0 cxVUGc'),
+    'feedback_number': ('div', 'FeedbackItem__FeedbackNumber-uof32n-1 kkESWs'),
+    'tags': ('div', 'TeacherTags__TagsContainer-sc-16vmh1y-0 dbxJaW'),
+    'tag': (None, 'Tag-bs9vf4-0 hHOVKF'),
+}
+
+# parser beautiful soup should use (lxml's is much faster than the pure python one)
+BS4_PARSER = 'lxml' if lxml is not None else 'html.parser'
+
+
+class ProfilePageError(Exception):
+    def __init__(self, prof_id, missing: str):
+
+        # the professor whose page couldn't be read and the selector that found nothing
+        self.prof_id = prof_id
+        self.missing = missing
+
+    def __str__(self):
+
+        return f"Profile page of professor {self.prof_id} has no '{self.missing}' element"
+
+
+class RawProfile:
+    def __init__(self, num_ratings_text: str, rating_text: str, feedback_texts: list, tags: list):
+
+        # the stripped text of each element, before any conversion
+        self.num_ratings_text = num_ratings_text
+        self.rating_text = rating_text
+        self.feedback_texts = feedback_texts
+        self.tags = tags
+
+
+class SoupBackend:
+    name = 'bs4'
+
+    def __init__(self, parser: str = BS4_PARSER):
+        self.parser = parser
+
+    def extract(self, prof_id, page):
+        """
+        :param prof_id: the professor id
+        :param page: the html of the page (or an already built BeautifulSoup object)
+        :return: a RawProfile of the page
+        """
+        soup = page if isinstance(page, BeautifulSoup) else BeautifulSoup(page, self.parser)
+
+        def find(parent, key):
+            tag, class_ = PROFILE_SELECTORS[key]
+            return parent.find(tag, class_=class_)
+
+        def find_all(parent, key):
+            tag, class_ = PROFILE_SELECTORS[key]
+            return parent.find_all(tag, class_=class_)
+
+        num_ratings = find(soup, 'num_ratings')
+        num_ratings = num_ratings.find('a') if num_ratings is not None else None
+        rating = find(soup, 'rating')
+        feedback = find(soup, 'feedback')
+        for key, element in [('num_ratings', num_ratings), ('rating', rating), ('feedback', feedback)]:
+            if element is None:
+                raise ProfilePageError(prof_id, key)
+
+        tags = find(soup, 'tags')
+        return RawProfile(
+            num_ratings.get_text(strip=True),
+            rating.get_text(strip=True),
+            [x.get_text(strip=True) for x in find_all(feedback, 'feedback_number')],
+            [x.get_text(strip=True) for x in find_all(tags, 'tag')] if tags is not None else [],
+        )
+
+
+class LxmlBackend:
+    name = 'lxml'
+
+    def __init__(self):
+        if lxml is None:
+            raise ImportError("lxml is needed for the lxml extraction backend")
+
+        # compile one xpath per selector up front; exact class matches, same as beautiful soup's class_ does
+        self._xpaths = {}
+        for key, (tag, class_) in PROFILE_SELECTORS.items():
+            self._xpaths[key] = lxml.etree.XPath(f'.//{tag or "*"}[@class="{class_}"]')
+
+    @staticmethod
+    def _text(element):
+        # beautiful soup's get_text(strip=True)
+        return ''.join(x.strip() for x in element.itertext())
+
+    def extract(self, prof_id, page):
+        """
+        :param prof_id: the professor id
+        :param page: the html of the page
+        :return: a RawProfile of the page
+        """
+        root = lxml.html.fromstring(page)
+
+        def find(parent, key):
+            found = self._xpaths[key](parent)
+            return found[0] if found else None
+
+        num_ratings = find(root, 'num_ratings')
+        num_ratings = num_ratings.find('.//a') if num_ratings is not None else None
+        rating = find(root, 'rating')
+        feedback = find(root, 'feedback')
+        for key, element in [('num_ratings', num_ratings), ('rating', rating), ('feedback', feedback)]:
+            if element is None:
+                raise ProfilePageError(prof_id, key)
+
+        tags = find(root, 'tags')
+        return RawProfile(
+            self._text(num_ratings),
+            self._text(rating),
+            [self._text(x) for x in self._xpaths['feedback_number'](feedback)],
+            [self._text(x) for x in self._xpaths['tag'](tags)] if tags is not None else [],
+        )
+
+
+def build_profile(prof_id, raw):
+    """
+    :param prof_id: the professor id
+    :param raw: a RawProfile
+    :return: the ProfessorProfile with every value converted
+    """
+
+    # number of ratings; if there are none specify 0
+    if raw.num_ratings_text == 'Add a rating.':
+        num_of_ratings = 0
+    else:
+        num_of_ratings = int(raw.num_ratings_text.split('ratings')[0])
+
+    # average rating; specify if it's N/A
+    rating = raw.rating_text
+    if rating != 'N/A':
+        rating = float(rating)
+
+    # would take again percentage and level of difficulty (if they exist)
+    percentage = raw.feedback_texts[0]
+    if percentage != 'N/A':
+        percentage = float(percentage[:-1]) / 100
+    if len(raw.feedback_texts) == 2:
+        lvl = float(raw.feedback_texts[1])
+    else:
+        lvl = 'N/A'
+
+    return ProfessorProfile(prof_id, num_of_ratings, rating, percentage, lvl, raw.tags)
+
+
+# the fast backend when it is installed, with beautiful soup behind it
+DEFAULT_BACKENDS = [LxmlBackend(), SoupBackend()] if lxml is not None else [SoupBackend()]
+
+
+def extract_profile(prof_id, page, backends=None):
+    """
+    :param prof_id: the professor id
+    :param page: the html of the professor's page
+    :param backends: backends to try in order (the default is lxml, falling back to beautiful soup)
+    :return: a ProfessorProfile for the given professor
+    """
+    backends = backends if backends is not None else DEFAULT_BACKENDS
+
+    # a backend that chokes on the page (or doesn't find something) hands it to the next one
+    error = None
+    for backend in backends:
+        try:
+            return build_profile(prof_id, backend.extract(prof_id, page))
+        except Exception as e:
+            error = e
+
+    raise error
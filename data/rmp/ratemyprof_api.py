@@ -1,10 +1,10 @@
-import requests
-import json
 import math
 import csv
 import os
 
-from professor import Professor
+from professor import Professor, ProfessorTable
+from review_store import REVIEW_COLUMNS, ReviewStore
+from common.transport import HttpTransport
 # This code has been tested using Python 3.6 interpreter and Linux (Ubuntu).
 # It should run under Windows, if anything you may need to make some adjustments for the file paths of the CSV files.
 
@@ -13,7 +13,7 @@ class ProfessorNotFound(Exception):
     def __init__(self, search_argument, search_parameter: str = "Name"):
 
         # What the client is looking for. Ex: "Professor Pattis"
-        self.search_argument = self.search_argument
+        self.search_argument = search_argument
 
         # The search criteria. Ex: Last Name
         self.search_parameter = search_parameter
@@ -28,46 +28,99 @@ class ProfessorNotFound(Exception):
 
 
 class RateMyProfApi:
-    def __init__(self, school_id: str = "1074", testing: bool = False):
+    def __init__(self, school_id: str = "1074", testing: bool = False, transport: HttpTransport = None,
+                 max_workers: int = 8, cache=None, metrics=None):
         self.UniversityId = school_id
 
-        # dict of Professor
-        self.professors = self.scrape_professors(testing)
+        # shared connection pool / worker pool (and optional ResponseCache) used by every request this object makes
+        self.transport = transport if transport is not None else HttpTransport(max_workers, cache=cache,
+                                                                               metrics=metrics)
+
+        # request latencies and stage progress of everything this object fetches
+        self.metrics = self.transport.metrics
+
+        # the listing is only downloaded once something asks for it (see iter_professors / professors)
+        self.testing = testing
+        self.num_of_professors = None
+        self._professors = None
+        self._professor_table = None
         self.indexnumber = False
 
+    @property
+    def professors(self):
+        # list of every professor's raw json, scraped the first time it is needed and kept afterwards
+        if self._professors is None:
+            self._professors = self.scrape_professors(self.testing)
+        return self._professors
+
+    @staticmethod
+    def professor_list_url(school_id, page_num):
+        # url of one page (20 professors) of a school's professor listing
+        return (
+            "http://www.ratemyprofessors.com/filter/professor/?&page="
+            + str(page_num)
+            + "&filter=teacherlastname_sort_s+asc&query=*%3A*&queryoption=TEACHER&queryBy=schoolId&sid="
+            + str(school_id)
+        )
+
+    @staticmethod
+    def reviews_url(tid, page_num):
+        # url of one page (20 reviews) of a professor's ratings
+        return (
+            "https://www.ratemyprofessors.com/paginate/professors/ratings?tid="
+            + str(tid)
+            + "&filter=&courseCode=&page="
+            + str(page_num)
+        )
+
+    def iter_professor_pages(self, testing: bool = False):
+        # yields the professors one listing page (20 of them) at a time, as soon as each page arrives
+        if self._professors is not None:
+            for i in range(0, len(self._professors), 20):
+                yield self._professors[i:i + 20]
+            return
+
+        # the first page tells us how many pages there are, and its professors don't need fetching again
+        first_page = self.transport.get_json(self.professor_list_url(self.UniversityId, 1))
+        self.num_of_professors = first_page["remaining"] + 20
+        num_of_pages = math.ceil(self.num_of_professors / 20)
+        self.metrics.set_total("listing", self.num_of_professors)
+        self.metrics.add_items("listing", len(first_page["professors"]))
+        yield first_page["professors"]
+
+        # for test cases, limit to 2 iterations
+        if testing:
+            num_of_pages = min(num_of_pages, 2)
+
+        # later pages are fetched a few ahead of whoever is consuming them; results come back in page order
+        urls = [self.professor_list_url(self.UniversityId, i) for i in range(2, num_of_pages + 1)]
+        for json_response in self.transport.imap(self.transport.get_json, urls):
+            self.metrics.add_items("listing", len(json_response["professors"]))
+            yield json_response["professors"]
+
+    def iter_professors(self, testing: bool = False):
+        # yields every professor's raw json one at a time, without waiting for the whole listing
+        for professor_list in self.iter_professor_pages(testing):
+            for json_professor in professor_list:
+                yield json_professor
+
     def scrape_professors(
         self,
         testing: bool = False
     ):  # creates List object that include basic information on all Professors from Northeastern University
         professors = []
-        num_of_prof = self.get_num_of_professors(self.UniversityId)
-        num_of_pages = math.ceil(num_of_prof / 20)
-
-        for i in range(1, num_of_pages + 1):  # the loop insert all professor into list
-            page = requests.get(
-                "http://www.ratemyprofessors.com/filter/professor/?&page="
-                + str(i)
-                + "&filter=teacherlastname_sort_s+asc&query=*%3A*&queryoption=TEACHER&queryBy=schoolId&sid="
-                + str(self.UniversityId)
-            )
-            json_response = json.loads(page.content)
-            professor_list = json_response["professors"]
-
-            for json_professor in professor_list:
-                professors.append(json_professor)
-                """
-                professor = Professor(
-                    json_professor["tid"],
-                    json_professor["tFname"],
-                    json_professor["tLname"],
-                    json_professor["tNumRatings"],
-                    json_professor["overall_rating"])
-
-                professors[professor.ratemyprof_id] = professor
-                """
-
-            # for test cases, limit to 2 iterations
-            if testing and (i > 1): break
+        for json_professor in self.iter_professors(testing):  # the loop insert all professor into list
+            professors.append(json_professor)
+            """
+            professor = Professor(
+                json_professor["tid"],
+                json_professor["tFname"],
+                json_professor["tLname"],
+                json_professor["tNumRatings"],
+                json_professor["overall_rating"])
+
+            professors[professor.ratemyprof_id] = professor
+            """
 
         return professors
 
@@ -79,11 +132,7 @@ class RateMyProfApi:
     def get_num_of_professors(
         self, id
     ):  # function returns the number of professors in the university of the given ID.
-        page = requests.get(
-            "http://www.ratemyprofessors.com/filter/professor/?&page=1&filter=teacherlastname_sort_s+asc&query=*%3A*&queryoption=TEACHER&queryBy=schoolId&sid="
-            + str(id)
-        )  # get request for page
-        temp_jsonpage = json.loads(page.content)
+        temp_jsonpage = self.transport.get_json(self.professor_list_url(id, 1))  # get request for page
         num_of_prof = (
             temp_jsonpage["remaining"] + 20
         )  # get the number of professors at Northeastern University
@@ -96,21 +145,45 @@ class RateMyProfApi:
         return self.indexnumber
 
 
+    @property
+    def professor_table(self):
+        # the listing as a compact ProfessorTable, indexed by id and name (built once, on first lookup)
+        if self._professor_table is None:
+            self._professor_table = ProfessorTable(self.professors)
+        return self._professor_table
+
+    def get_professor_by_tid(self, tid) -> Professor:
+        '''
+        Return the professor with the given rate my professor id.
+        '''
+        professor = self.professor_table.by_tid(tid)
+        if professor is None:
+            raise ProfessorNotFound(tid, "ID")
+        return professor
+
     def get_professor_by_last_name(
         self, last_name
-    ) -> Professor:
+    ) -> list:
         '''
-        Return the first professor with the matching last name.
+        Return every professor with the matching last name.
         Case insenstive.
         '''
-        last_name = last_name.lower()
-        for name in self.professors:
-            if last_name == self.professors[name].last_name.lower():
-                return self.professors[name]
+        professors = self.professor_table.by_last_name(last_name)
 
         # Raise error if no matching professor found
-        raise ProfessorNotFound(last_name, "Last Name")
+        if not professors:
+            raise ProfessorNotFound(last_name, "Last Name")
+        return professors
 
+    def get_professors_by_name(self, name) -> list:
+        '''
+        Return every professor with the matching full name ("first last" or "first middle last").
+        Case insenstive.
+        '''
+        professors = self.professor_table.by_name(name)
+        if not professors:
+            raise ProfessorNotFound(name)
+        return professors
 
 
     def WriteProfessorListToCSV(self):
@@ -137,71 +210,52 @@ class RateMyProfApi:
 
 
     def create_reviews_list(self, tid):
-        tempreviewslist = []
-        num_of_reviews = self.get_num_of_reviews(tid)
-        # RMP only loads 20 reviews per page,
+        return self.create_reviews_lists([tid])[0]
+
+
+    def create_reviews_lists(self, tids, max_reviews=None):
+        # returns the reviews of every given professor (one list per tid, in the same order)
+        # max_reviews optionally caps, per tid, how many of the newest reviews we need (None means all of them)
+        tids = list(tids)
+        if max_reviews is None:
+            max_reviews = [None] * len(tids)
+        self.metrics.add_total("reviews", len(tids))
+        with self.metrics.stage("reviews"):
+            reviews_lists = self._fetch_reviews_lists(tids, max_reviews)
+        self.metrics.add_items("reviews", len(tids))
+        return reviews_lists
+
+
+    def _fetch_reviews_lists(self, tids, max_reviews):
+        # the first page of each professor gives both the number of reviews and the first 20 of them
+        first_pages = self.transport.map_json([self.reviews_url(tid, 1) for tid in tids])
+        reviews_lists = [list(temp_jsonpage["ratings"]) for temp_jsonpage in first_pages]
+
+        # RMP only loads 20 reviews per page (newest first),
         # so num_of_pages tells us how many pages we need to get all the reviews
-        num_of_pages = math.ceil(num_of_reviews / 20)
-        i = 1
-        while i <= num_of_pages:
-            page = requests.get(
-                "https://www.ratemyprofessors.com/paginate/professors/ratings?tid="
-                + str(tid)
-                + "&filter=&courseCode=&page="
-                + str(i)
-            )
-            temp_jsonpage = json.loads(page.content)
-            temp_list = temp_jsonpage["ratings"]
-            tempreviewslist.extend(temp_list)
-            i += 1
-        return tempreviewslist
+        remaining_pages = []
+        for index, (tid, temp_jsonpage, limit) in enumerate(zip(tids, first_pages, max_reviews)):
+            num_of_pages = math.ceil((temp_jsonpage["remaining"] + 20) / 20)
+            if limit is not None:
+                num_of_pages = min(num_of_pages, max(1, math.ceil(limit / 20)))
+            remaining_pages.extend((index, tid, i) for i in range(2, num_of_pages + 1))
+
+        # pages 2..N of every professor go out together over the shared worker pool
+        urls = [self.reviews_url(tid, i) for _, tid, i in remaining_pages]
+        for (index, _, _), temp_jsonpage in zip(remaining_pages, self.transport.map_json(urls)):
+            reviews_lists[index].extend(temp_jsonpage["ratings"])
+
+        return reviews_lists
 
 
     def get_num_of_reviews(self, id):
-        page = requests.get(
-            "https://www.ratemyprofessors.com/paginate/professors/ratings?tid="
-            + str(id)
-            + "&filter=&courseCode=&page=1"
-        )
-        temp_jsonpage = json.loads(page.content)
+        temp_jsonpage = self.transport.get_json(self.reviews_url(id, 1))
         num_of_reviews = temp_jsonpage["remaining"] + 20
         return num_of_reviews
 
 
     def WriteReviewsListToCSV(self, rlist, tid):
-        csv_columns = [
-            "attendance",
-            "clarityColor",
-            "easyColor",
-            "helpColor",
-            "helpCount",
-            "id",
-            "notHelpCount",
-            "onlineClass",
-            "quality",
-            "rClarity",
-            "rClass",
-            "rComments",
-            "rDate",
-            "rEasy",
-            "rEasyString",
-            "rErrorMsg",
-            "rHelpful",
-            "rInterest",
-            "rOverall",
-            "rOverallString",
-            "rStatus",
-            "rTextBookUse",
-            "rTimestamp",
-            "rWouldTakeAgain",
-            "sId",
-            "takenForCredit",
-            "teacher",
-            "teacherGrade",
-            "teacherRatingTags",
-            "unUsefulGrouping",
-            "usefulGrouping",
-        ]
+        csv_columns = REVIEW_COLUMNS
         csv_file = (
             "./SchoolID_" + str(self.UniversityId) + "/TeacherID_" + str(tid) + ".csv"
         )
@@ -211,3 +265,9 @@ class RateMyProfApi:
             for data in rlist:
                 writer.writerow(data)
 
+
+    def WriteReviewsListToStore(self, rlist, store: ReviewStore = None):
+        # appends the reviews to the partitioned parquet review table instead of one csv per teacher
+        if store is None:
+            store = ReviewStore()
+        store.append(rlist)
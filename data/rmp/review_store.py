@@ -0,0 +1,303 @@
+"""
+File: review_store.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Columnar (Parquet) review table partitioned by school and keyed by (sId, teacher, id)
+"""
+
+# import necessary libraries
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+
+# every field a review comes back from the api with
+REVIEW_COLUMNS = [
+    "attendance",
+    "clarityColor",
+    "easyColor",
+    "helpColor",
+    "helpCount",
+    "id",
+    "notHelpCount",
+    "onlineClass",
+    "quality",
+    "rClarity",
+    "rClass",
+    "rComments",
+    "rDate",
+    "rEasy",
+    "rEasyString",
+    "rErrorMsg",
+    "rHelpful",
+    "rInterest",
+    "rOverall",
+    "rOverallString",
+    "rStatus",
+    "rTextBookUse",
+    "rTimestamp",
+    "rWouldTakeAgain",
+    "sId",
+    "takenForCredit",
+    "teacher",
+    "teacherGrade",
+    "teacherRatingTags",
+    "unUsefulGrouping",
+    "usefulGrouping",
+]
+
+# a review is unique by its school, its professor and its own id
+REVIEW_KEY = ["sId", "teacher", "id"]
+
+# low-cardinality strings are dictionary encoded, everything numeric gets a real type
+_LABEL = pa.dictionary(pa.int32(), pa.string())
+REVIEW_SCHEMA = pa.schema([
+    ("attendance", _LABEL),
+    ("clarityColor", _LABEL),
+    ("easyColor", _LABEL),
+    ("helpColor", _LABEL),
+    ("helpCount", pa.int32()),
+    ("id", pa.int64()),
+    ("notHelpCount", pa.int32()),
+    ("onlineClass", _LABEL),
+    ("quality", _LABEL),
+    ("rClarity", pa.float32()),
+    ("rClass", _LABEL),
+    ("rComments", pa.string()),
+    ("rDate", pa.date32()),
+    ("rEasy", pa.float32()),
+    ("rEasyString", _LABEL),
+    ("rErrorMsg", pa.string()),
+    ("rHelpful", pa.float32()),
+    ("rInterest", _LABEL),
+    ("rOverall", pa.float32()),
+    ("rOverallString", _LABEL),
+    ("rStatus", pa.int32()),
+    ("rTextBookUse", _LABEL),
+    ("rTimestamp", pa.int64()),
+    ("rWouldTakeAgain", _LABEL),
+    ("takenForCredit", _LABEL),
+    ("teacher", pa.int64()),
+    ("teacherGrade", _LABEL),
+    ("teacherRatingTags", pa.list_(_LABEL)),
+    ("unUsefulGrouping", _LABEL),
+    ("usefulGrouping", _LABEL),
+    ("scraped_at", pa.timestamp("s")),
+])
+
+# what gets handed to the writer: the file schema plus the partition column
+_TABLE_SCHEMA = REVIEW_SCHEMA.append(pa.field("sId", pa.int32()))
+
+# the school is the directory partition (sId=<id>/) instead of a column inside the files
+_PARTITIONING = ds.partitioning(pa.schema([("sId", pa.int32())]), flavor="hive")
+
+_INTEGER_COLUMNS = ["helpCount", "id", "notHelpCount", "rStatus", "rTimestamp", "teacher", "sId"]
+_FLOAT_COLUMNS = ["rClarity", "rEasy", "rHelpful", "rOverall"]
+
+
+def reviews_to_table(reviews):
+    """
+    :param reviews: a list of raw review dicts from RateMyProfApi
+    :return: a pyarrow table of the reviews with the store's schema (plus the sId partition column)
+    """
+    reviews = list(reviews)
+    if not reviews:
+        return _TABLE_SCHEMA.empty_table()
+    reviews_df = pd.DataFrame(reviews).reindex(columns=REVIEW_COLUMNS)
+
+    # the api is loose with types, so anything that doesn't parse becomes null instead of failing the batch
+    for column in _INTEGER_COLUMNS:
+        reviews_df[column] = pd.to_numeric(reviews_df[column], errors='coerce').astype('Int64')
+    for column in _FLOAT_COLUMNS:
+        reviews_df[column] = pd.to_numeric(reviews_df[column], errors='coerce')
+    reviews_df['rDate'] = pd.to_datetime(reviews_df['rDate'], format='%m/%d/%Y', errors='coerce').dt.date
+    reviews_df['teacherRatingTags'] = reviews_df['teacherRatingTags'].apply(
+        lambda x: list(x) if isinstance(x, (list, tuple)) else [])
+    for field in REVIEW_SCHEMA:
+        if pa.types.is_dictionary(field.type) or pa.types.is_string(field.type):
+            reviews_df[field.name] = reviews_df[field.name].astype(object).apply(
+                lambda x: None if x is None or (isinstance(x, float) and pd.isna(x)) else str(x))
+    reviews_df['scraped_at'] = pd.Timestamp.now().floor('s')
+
+    return pa.Table.from_pandas(reviews_df[_TABLE_SCHEMA.names], schema=_TABLE_SCHEMA, preserve_index=False)
+
+
+class ReviewStore:
+    def __init__(self, root: str = "rmp_reviews"):
+        """
+        :param root: directory holding one sId=<school id> partition per school
+        """
+        self.root = root
+
+        # professors whose reviews were dropped, as {school id: {teacher id: unix time}}; anything of theirs scraped
+        # before that time is hidden by load() until compact() rewrites the partition without it. files starting
+        # with "_" are never scanned as part of the dataset
+        self._tombstones_path = os.path.join(root, "_deleted_teachers.json")
+        self.tombstones = {}
+        if os.path.exists(self._tombstones_path):
+            with open(self._tombstones_path) as tombstones_file:
+                self.tombstones = json.load(tombstones_file)
+
+        # a compact that stopped between moving the old partition aside and moving the new one in is undone
+        if os.path.isdir(root):
+            for name in os.listdir(root):
+                if name.startswith("_old-") and not os.path.isdir(os.path.join(root, name[len("_old-"):])):
+                    os.replace(os.path.join(root, name), os.path.join(root, name[len("_old-"):]))
+
+    def append(self, reviews):
+        """
+        :param reviews: a list of raw review dicts from RateMyProfApi
+        :return: null
+        """
+        table = reviews_to_table(reviews)
+        self.append_table(table.filter(pc.is_valid(table["sId"])))
+
+    def dataset(self):
+        # the whole store as a lazily scanned pyarrow dataset
+        return ds.dataset(self.root, format="parquet", partitioning=_PARTITIONING)
+
+    def load(self, school_ids=None, teacher_ids=None, start_date=None, end_date=None, columns=None):
+        """
+        :param school_ids: only these schools (whole partitions are skipped otherwise)
+        :param teacher_ids: only these professors
+        :param start_date: only reviews on or after this date
+        :param end_date: only reviews on or before this date
+        :param columns: only these columns (the key is always included)
+        :return: a dataframe with one row per (sId, teacher, id), keeping the most recently scraped copy
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns if columns is not None else REVIEW_COLUMNS)
+
+        # every condition is pushed down to the scan so non matching partitions/row groups are never read
+        condition = None
+        for expression in [
+            ds.field("sId").isin([int(x) for x in school_ids]) if school_ids is not None else None,
+            ds.field("teacher").isin([int(x) for x in teacher_ids]) if teacher_ids is not None else None,
+            ds.field("rDate") >= _as_date(start_date) if start_date is not None else None,
+            ds.field("rDate") <= _as_date(end_date) if end_date is not None else None,
+        ]:
+            if expression is not None:
+                condition = expression if condition is None else condition & expression
+
+        if columns is not None:
+            columns = REVIEW_KEY + [x for x in columns if x not in REVIEW_KEY] + ["scraped_at"]
+        table = self.dataset().to_table(columns=columns, filter=condition)
+
+        # the same review can be written by several runs; the latest scrape wins, unless the professor was deleted
+        # after it was scraped
+        reviews_df = self._without_deleted(table.to_pandas())
+        reviews_df = reviews_df.sort_values("scraped_at", kind="stable")
+        reviews_df = reviews_df.drop_duplicates(subset=REVIEW_KEY, keep="last")
+        return reviews_df.sort_values(REVIEW_KEY).reset_index(drop=True)
+
+    def _without_deleted(self, reviews_df):
+        # reviews left out because their professor was deleted after they were scraped
+        cutoffs = [(int(school_id), int(teacher), cutoff) for school_id, teachers in self.tombstones.items()
+                   for teacher, cutoff in teachers.items()]
+        if not cutoffs or reviews_df.empty:
+            return reviews_df
+        cutoffs_df = pd.DataFrame(cutoffs, columns=["sId", "teacher", "_cutoff"])
+        cutoffs_df["_cutoff"] = pd.to_datetime(cutoffs_df["_cutoff"], unit="s")
+        merged_df = reviews_df.merge(cutoffs_df.astype({"sId": reviews_df["sId"].dtype,
+                                                        "teacher": reviews_df["teacher"].dtype}),
+                                     on=["sId", "teacher"], how="left")
+        deleted = (merged_df["scraped_at"] < merged_df["_cutoff"]).to_numpy()
+        return reviews_df[~deleted]
+
+    def delete_teachers(self, school_id, teacher_ids):
+        """ Drops every stored review of some professors (before they are fetched again in full, so reviews
+        taken down since the last run don't linger); nothing is rewritten until the next compact
+        :param school_id: the school the professors are at
+        :param teacher_ids: the professors
+        :return: null
+        """
+        teacher_ids = [int(x) for x in teacher_ids]
+        if not teacher_ids:
+            return
+
+        # reviews scraped from the next second on are the new ones, and are kept
+        cutoff = int(time.time())
+        school = self.tombstones.setdefault(str(int(school_id)), {})
+        for teacher in teacher_ids:
+            school[str(teacher)] = cutoff
+        self._save_tombstones()
+
+    def _save_tombstones(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._tombstones_path + ".tmp", "w") as tombstones_file:
+            json.dump(self.tombstones, tombstones_file)
+        os.replace(self._tombstones_path + ".tmp", self._tombstones_path)
+
+    def compact(self, school_id):
+        """
+        :param school_id: the school whose partition gets rewritten as one deduplicated file (without the
+                          reviews of deleted professors)
+        :return: null
+        """
+        name = f"sId={int(school_id)}"
+        partition = os.path.join(self.root, name)
+        temp_root = os.path.join(self.root, f"_compact-{name}")
+        old_partition = os.path.join(self.root, f"_old-{name}")
+        for directory in [temp_root, old_partition]:
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+
+        # the new partition is written next to the old one, and only swapped in once it is complete
+        school_df = self.load(school_ids=[school_id])
+        if not school_df.empty:
+            self._write_table(pa.Table.from_pandas(school_df, preserve_index=False), temp_root)
+        if os.path.isdir(partition):
+            os.replace(partition, old_partition)
+        if os.path.isdir(os.path.join(temp_root, name)):
+            os.replace(os.path.join(temp_root, name), partition)
+        for directory in [temp_root, old_partition]:
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+
+        # the rewritten partition has nothing left to hide
+        if self.tombstones.pop(str(int(school_id)), None) is not None:
+            self._save_tombstones()
+
+    def append_table(self, table):
+        """
+        :param table: an already typed table (from reviews_to_table or load) to write into the store
+        :return: null
+        """
+        self._write_table(table, self.root)
+
+    def _write_table(self, table, root):
+        # write a table into a (partitioned) store directory
+        if table.num_rows == 0:
+            return
+        table = table.cast(pa.schema([_TABLE_SCHEMA.field(name) for name in table.column_names]))
+
+        # rows sorted by professor keep each file's teacher statistics tight, which is what lets
+        # teacher filters skip whole row groups; file names sort in the order they were written
+        ds.write_dataset(
+            table.sort_by([("teacher", "ascending"), ("id", "ascending")]), root, format="parquet",
+            partitioning=_PARTITIONING, existing_data_behavior="overwrite_or_ignore",
+            basename_template=f"part-{time.time_ns():020d}-{threading.get_ident()}-{{i}}.parquet",
+        )
+
+    def clear(self):
+        # remove every stored review
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        self.tombstones = {}
+
+
+def _as_date(value):
+    # accept dates, datetimes or strings for the date filters
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return pd.Timestamp(value).date()
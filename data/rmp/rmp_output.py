@@ -0,0 +1,82 @@
+"""
+File: rmp_output.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Streams scraped Rate My Professor rows to disk in batches with a checkpoint to resume from
+"""
+
+# import necessary libraries
+import csv
+import json
+import os
+
+
+class CheckpointedCsvWriter:
+    def __init__(self, path: str, checkpoint_path: str, columns: list):
+        """
+        :param path: the csv being written while the run is in progress
+        :param checkpoint_path: json file recording how far the csv got and which professors are in it
+        :param columns: the columns (in order) of the csv
+        """
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.columns = columns
+
+        # pick up where an interrupted run stopped, otherwise start a fresh file
+        self.done_tids = set()
+        self._bytes_written = 0
+        if os.path.exists(checkpoint_path) and os.path.exists(path):
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            self.done_tids = set(checkpoint['done'])
+            self._bytes_written = checkpoint['bytes']
+
+            # anything after the checkpoint belongs to a batch that never finished
+            with open(path, 'r+b') as csvfile:
+                csvfile.truncate(self._bytes_written)
+        else:
+            open(path, 'wb').close()
+
+    def is_resuming(self):
+        # True if rows from an earlier, interrupted run are already on disk
+        return len(self.done_tids) > 0
+
+    def write_rows(self, rows_df):
+        """
+        :param rows_df: a batch of finished professor rows (with an 'ID' column)
+        :return: null
+        """
+        if rows_df.empty:
+            return
+
+        # append the batch and make sure it is really on disk before we checkpoint it
+        with open(self.path, 'a', newline='') as csvfile:
+            rows_df[self.columns].to_csv(csvfile, header=(self._bytes_written == 0), index=False)
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+            self._bytes_written = csvfile.tell()
+
+        self.done_tids.update(int(tid) for tid in rows_df['ID'])
+        self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        # swap in the new checkpoint in one step so it is never half written
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({'bytes': self._bytes_written, 'done': sorted(self.done_tids)}, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def finish(self, final_path):
+        """
+        :param final_path: where the completed csv should end up
+        :return: null
+        """
+
+        # an empty run still produces a csv with a header
+        if self._bytes_written == 0:
+            with open(self.path, 'w', newline='') as csvfile:
+                csv.writer(csvfile).writerow(self.columns)
+
+        os.replace(self.path, final_path)
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,325 @@
+"""
+File: db_loader.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Batched loader of the cleaned TRACE scores and Rate My Professor data into the serving database
+             (Postgres, or SQLite standing in for it), upserting only rows that changed
+"""
+
+# import necessary libraries
+import os
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+# db_loader is only ever run as a script, so it sets up the path to the trace modules itself
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trace_survey'))
+
+from trace_cleaning import OUTPUT_TERM_COLUMN, clean_chunk, raw_section_paths, section_dtypes
+from trace_store import term_of
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+
+# every table: its columns (name, sqlite type, postgres type), natural key and the indexes built after loading
+TABLES = {
+    'trace_evals': {
+        'columns': [('term', 'TEXT', 'text'), ('course_id', 'INTEGER', 'integer'), ('section', 'TEXT', 'text'),
+                    ('instructor', 'TEXT', 'text'), ('survey', 'INTEGER', 'integer'), ('course_title', 'TEXT', 'text'),
+                    ('professor_score', 'REAL', 'double precision')],
+
+        # a team taught section has one survey per instructor, so the section alone doesn't identify a row; the
+        # term is the real one only for trace_runner's csvs (for a section csv it is the file's label, and that
+        # file spans several terms that reuse course ids), so survey numbers the repeats of the same key in a csv
+        'key': ['term', 'course_id', 'section', 'instructor', 'survey'],
+        'indexes': [['instructor'], ['course_title'], ['course_id']],
+    },
+    'rmp_professors': {
+        'columns': [('tid', 'INTEGER', 'bigint'), ('first_name', 'TEXT', 'text'), ('middle_name', 'TEXT', 'text'),
+                    ('last_name', 'TEXT', 'text'), ('department', 'TEXT', 'text'),
+                    ('institution_name', 'TEXT', 'text'), ('institution_id', 'INTEGER', 'integer'),
+                    ('num_ratings', 'INTEGER', 'integer'), ('avg_rating', 'REAL', 'double precision'),
+                    ('would_take_again', 'REAL', 'double precision'), ('difficulty', 'REAL', 'double precision'),
+                    ('tags', 'TEXT', 'text')],
+        'key': ['tid'],
+        'indexes': [['last_name'], ['department']],
+    },
+}
+
+# every row also stores a hash of its values, which is how changed rows are found without comparing them
+HASH_COLUMN = 'row_hash'
+
+# rows per insert batch
+BATCH_SIZE = 5000
+
+# rate my professor output columns -> rmp_professors columns
+RMP_COLUMNS = {
+    'ID': 'tid', 'First Name': 'first_name', 'Middle Name': 'middle_name', 'Last Name': 'last_name',
+    'Department': 'department', 'Institution Name': 'institution_name', 'Institution ID': 'institution_id',
+    'Number of Ratings': 'num_ratings', 'Average Rating (Out of 5)': 'avg_rating',
+    'Would Take Again (Percent)': 'would_take_again', 'Level of Difficulty (Out of 5)': 'difficulty',
+    'Popular Tags': 'tags',
+}
+
+
+def trace_eval_rows(path, variant='All', term=None, chunksize=5000):
+    """
+    :param path: a raw trace survey csv
+    :param variant: 'All' (every survey) or 'Filtered' (surveys with an overall rating), as trace_cleaning makes
+    :param term: the term label of rows without a term of their own (taken from the file name by default)
+    :param chunksize: survey rows held in memory at once
+    :return: the trace_evals rows of the csv (the cleaned score plus the section and term it came from)
+    """
+    term = term if term is not None else term_of(path)
+    parts = []
+    for surveys_df in pd.read_csv(path, dtype=section_dtypes(path), chunksize=chunksize):
+        all_df, filtered_df = clean_chunk(surveys_df)
+        scores_df = all_df if variant == 'All' else filtered_df
+
+        # the cleaned rows keep the raw index, so the section lines back up with them; the term is the one each
+        # survey was scraped under if the csv says, otherwise the file's label
+        terms = scores_df[OUTPUT_TERM_COLUMN].fillna(term) if OUTPUT_TERM_COLUMN in scores_df.columns else term
+        parts.append(scores_df.assign(section=surveys_df.loc[scores_df.index, 'Section'], term=terms))
+
+    columns = [x for x in table_columns('trace_evals') if x != 'survey']
+    rows_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+    for column in ['instructor', 'course_title', 'section']:
+        rows_df[column] = rows_df[column].str.strip()
+    rows_df = rows_df.dropna(subset=['course_id', 'instructor'])
+
+    # surveys sharing a key are all kept, numbered in the order the csv has them
+    key = [x for x in TABLES['trace_evals']['key'] if x != 'survey']
+    rows_df['survey'] = rows_df.groupby(key, sort=False).cumcount() + 1
+    repeats = int((rows_df['survey'] > 1).sum())
+    if repeats:
+        print(f"{repeats} Surveys in {os.path.basename(path)} Repeat a Term/Course/Section/Instructor!")
+    return rows_df[table_columns('trace_evals')]
+
+
+def rmp_rows(path):
+    """
+    :param path: the rate my professor output csv
+    :return: the rmp_professors rows of the csv
+    """
+    rmp_df = pd.read_csv(path, dtype=str, keep_default_na=False).rename(columns=RMP_COLUMNS)
+    rmp_df = rmp_df.reindex(columns=table_columns('rmp_professors'))
+
+    # the scraper writes 'N/A' when a value doesn't exist
+    for column in ['tid', 'institution_id', 'num_ratings']:
+        rmp_df[column] = pd.to_numeric(rmp_df[column], errors='coerce').astype('Int64')
+    for column in ['avg_rating', 'would_take_again', 'difficulty']:
+        rmp_df[column] = pd.to_numeric(rmp_df[column], errors='coerce')
+    for column in ['first_name', 'middle_name', 'last_name', 'department', 'institution_name', 'tags']:
+        rmp_df[column] = rmp_df[column].fillna('').str.strip()
+    rmp_df = rmp_df.dropna(subset=['tid'])
+    return rmp_df.drop_duplicates(subset=['tid'], keep='last')
+
+
+def table_columns(table):
+    # the value columns of a table, in order
+    return [name for name, _, _ in TABLES[table]['columns']]
+
+
+def _records(rows_df):
+    # rows as tuples of plain python values (numpy scalars unwrapped, missing values as None)
+    return [tuple(None if pd.isna(x) else x.item() if hasattr(x, 'item') else x for x in row)
+            for row in rows_df.itertuples(index=False, name=None)]
+
+
+def row_hashes(rows_df, table):
+    # one signed 64 bit hash per row of its values (fits an INTEGER/bigint column)
+    return pd.util.hash_pandas_object(rows_df[table_columns(table)], index=False).astype('int64')
+
+
+class ServingDatabase:
+    def __init__(self, url: str):
+        """
+        :param url: 'sqlite:///<path>' for a local stand-in, or a 'postgresql://' connection string
+        """
+        self.url = url
+        if url.startswith('sqlite:///'):
+            self.dialect = 'sqlite'
+            self.connection = sqlite3.connect(url[len('sqlite:///'):])
+            self.placeholder = '?'
+        elif url.startswith(('postgresql://', 'postgres://')):
+            if psycopg is None:
+                raise ImportError("psycopg (3) is needed to load into postgres")
+            self.dialect = 'postgres'
+            self.connection = psycopg.connect(url)
+            self.placeholder = '%s'
+        else:
+            raise ValueError(f"Unsupported database url: {url}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def create_table(self, table):
+        # the table with its natural key as the primary key (secondary indexes come after loading)
+        types = [f"{name} {sqlite_type if self.dialect == 'sqlite' else postgres_type}"
+                 for name, sqlite_type, postgres_type in TABLES[table]['columns']]
+        types.append(f"{HASH_COLUMN} {'INTEGER' if self.dialect == 'sqlite' else 'bigint'}")
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(types)}, "
+                                f"PRIMARY KEY ({', '.join(TABLES[table]['key'])}))")
+
+    def create_indexes(self, table):
+        for columns in TABLES[table]['indexes']:
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(columns)} "
+                                    f"ON {table} ({', '.join(columns)})")
+
+    def stored_hashes(self, table, terms=None):
+        """
+        :param table: a table
+        :param terms: only rows of these terms (trace_evals only)
+        :return: the natural key and row hash of every stored row
+        """
+        key = TABLES[table]['key']
+        query = f"SELECT {', '.join(key)}, {HASH_COLUMN} FROM {table}"
+        params = []
+        if terms is not None and not terms:
+            return pd.DataFrame(columns=key + [HASH_COLUMN])
+        if terms is not None:
+            query += f" WHERE term IN ({', '.join([self.placeholder] * len(terms))})"
+            params = list(terms)
+        cursor = self.connection.execute(query, params)
+        return pd.DataFrame(cursor.fetchall(), columns=key + [HASH_COLUMN])
+
+    def upsert(self, table, rows_df):
+        """
+        :param table: a table
+        :param rows_df: rows to insert, or to update where their natural key is already stored
+        :return: null
+        """
+        columns = table_columns(table) + [HASH_COLUMN]
+        key = TABLES[table]['key']
+        updates = ', '.join(f"{x} = excluded.{x}" for x in columns if x not in key)
+        conflict = f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}"
+        records = _records(rows_df[columns])
+
+        # postgres: COPY everything into a staging table, then one upsert from it
+        if self.dialect == 'postgres':
+            staging = f"{table}_staging"
+            self.connection.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                                    f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+            with self.connection.cursor() as cursor:
+                with cursor.copy(f"COPY {staging} ({', '.join(columns)}) FROM STDIN") as copy:
+                    for record in records:
+                        copy.write_row(record)
+                cursor.execute(f"INSERT INTO {table} ({', '.join(columns)}) "
+                               f"SELECT {', '.join(columns)} FROM {staging} {conflict}")
+            return
+
+        # sqlite: multi row upserts, a batch at a time
+        statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                     f"VALUES ({', '.join([self.placeholder] * len(columns))}) {conflict}")
+        for i in range(0, len(records), BATCH_SIZE):
+            self.connection.executemany(statement, records[i:i + BATCH_SIZE])
+
+    def delete(self, table, keys_df):
+        """
+        :param table: a table
+        :param keys_df: natural keys of the rows to remove
+        :return: null
+        """
+        key = TABLES[table]['key']
+        statement = f"DELETE FROM {table} WHERE {' AND '.join(f'{x} = {self.placeholder}' for x in key)}"
+        records = _records(keys_df[key])
+        cursor = self.connection.cursor()
+        for i in range(0, len(records), BATCH_SIZE):
+            cursor.executemany(statement, records[i:i + BATCH_SIZE])
+        cursor.close()
+
+    def load(self, table, rows_df, terms=None, prune=False):
+        """
+        :param table: 'trace_evals' or 'rmp_professors'
+        :param rows_df: every current row (of the given terms, for trace_evals)
+        :param terms: the terms rows_df covers; only those terms are compared against and pruned
+        :param prune: remove stored rows (of those terms) that aren't in rows_df anymore
+        :return: the number of rows upserted and deleted
+        """
+        key = TABLES[table]['key']
+        self.create_table(table)
+        rows_df = rows_df.assign(**{HASH_COLUMN: row_hashes(rows_df, table)})
+
+        # only rows that are new or whose values hash differently get sent
+        stored_df = self.stored_hashes(table, terms)
+        merged_df = rows_df[key + [HASH_COLUMN]].merge(stored_df, on=key, how='left', suffixes=('', '_stored'),
+                                                       indicator=True)
+        changed = (merged_df['_merge'] == 'left_only') | \
+            (merged_df[HASH_COLUMN] != merged_df[HASH_COLUMN + '_stored'])
+        changed_df = rows_df[changed.to_numpy()]
+
+        removed_df = stored_df.iloc[0:0]
+        if prune:
+            removed_df = stored_df.merge(rows_df[key], on=key, how='left', indicator=True)
+            removed_df = removed_df[removed_df['_merge'] == 'left_only']
+
+        # one transaction per load, with the secondary indexes built once the rows are in
+        try:
+            if len(changed_df):
+                self.upsert(table, changed_df)
+            if len(removed_df):
+                self.delete(table, removed_df)
+            self.create_indexes(table)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return len(changed_df), len(removed_df)
+
+    def close(self):
+        self.connection.close()
+
+
+def load_trace(database, paths, variant='All', prune=True):
+    """
+    :param database: a ServingDatabase
+    :param paths: raw trace survey csvs (section csvs, or trace_runner's term/merged csvs)
+    :param variant: 'All' or 'Filtered'
+    :param prune: remove stored surveys of these terms that are gone from the csvs
+    :return: the number of rows, and of those upserted and deleted
+    """
+    rows_df = pd.concat([trace_eval_rows(x, variant) for x in paths], ignore_index=True)
+
+    # the terms the csvs cover (a file's own label too, so a section csv that has emptied out is still pruned)
+    terms = sorted(set(rows_df['term']) | {term_of(x) for x in paths})
+    upserted, deleted = database.load('trace_evals', rows_df, terms=terms, prune=prune)
+    return len(rows_df), upserted, deleted
+
+
+def load_rmp(database, path, prune=False):
+    """
+    :param database: a ServingDatabase
+    :param path: the rate my professor output csv
+    :param prune: remove stored professors that aren't in the csv anymore
+    :return: the number of rows, and of those upserted and deleted
+    """
+    rows_df = rmp_rows(path)
+    upserted, deleted = database.load('rmp_professors', rows_df, prune=prune)
+    return len(rows_df), upserted, deleted
+
+
+if __name__ == '__main__':
+
+    # python db_loader.py <database url> [<rmp csv>] (the url can also come from SERVING_DATABASE_URL)
+    url = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('SERVING_DATABASE_URL', 'sqlite:///serving.sqlite')
+    rmp_path = sys.argv[2] if len(sys.argv) > 2 else '../rmp/northeastern_rmp_data.csv'
+
+    with ServingDatabase(url) as database:
+        start = time.perf_counter()
+        num_of_rows, upserted, deleted = load_trace(database, raw_section_paths('../trace_survey/trace_data_stores'))
+        print(f"Loaded TRACE: {upserted} of {num_of_rows} Rows Changed, {deleted} Removed "
+              f"in {time.perf_counter() - start:.2f}s!")
+
+        if os.path.exists(rmp_path):
+            start = time.perf_counter()
+            num_of_rows, upserted, deleted = load_rmp(database, rmp_path)
+            print(f"Loaded RMP: {upserted} of {num_of_rows} Rows Changed, {deleted} Removed "
+                  f"in {time.perf_counter() - start:.2f}s!")
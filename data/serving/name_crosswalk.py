@@ -0,0 +1,249 @@
+"""
+File: name_crosswalk.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Links Rate My Professor ids to TRACE instructor names by scoring only candidates that share a name block
+"""
+
+# import necessary libraries
+import glob
+import json
+import os
+import re
+import sys
+import unicodedata
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+
+# a match has to score at least this, and beat the runner up by the margin, to be trusted
+MATCH_THRESHOLD = 0.85
+AMBIGUITY_MARGIN = 0.05
+
+# last names that aren't spelled the same have to sound the same and be at least this alike to be trusted
+# (zhang/zheng and rich/reich are different people, mcdonald/macdonald usually aren't)
+SURNAME_RATIO = 0.9
+
+CROSSWALK_COLUMNS = ['tid', 'instructor', 'score', 'ambiguous']
+
+# short forms of first names that aren't simply a prefix of the full name
+NICKNAMES = {
+    'bill': 'william', 'bob': 'robert', 'dick': 'richard', 'jim': 'james', 'joe': 'joseph', 'mike': 'michael',
+    'tom': 'thomas', 'tony': 'anthony', 'liz': 'elizabeth', 'beth': 'elizabeth', 'kate': 'katherine',
+    'katie': 'katherine', 'kathy': 'katherine', 'peggy': 'margaret', 'maggie': 'margaret', 'jack': 'john',
+    'ted': 'edward', 'ned': 'edward', 'chuck': 'charles', 'hank': 'henry', 'sandy': 'alexandra',
+    'jackie': 'jacqueline', 'nick': 'nicholas', 'steve': 'stephen', 'sue': 'susan', 'patty': 'patricia',
+}
+
+# parts of a last name that are left out when comparing
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+# soundex digit of every consonant that has one (vowels, h, w and y have none)
+_SOUNDEX = {letter: digit for digit, letters in enumerate(['bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r'], 1)
+            for letter in letters}
+
+
+def normalize_name(name):
+    """
+    :param name: a name as either source has it
+    :return: the name lowercased, without accents or punctuation, with single spaces
+    """
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r"[^a-z ]+", ' ', name.casefold().replace("'", '')).split())
+
+
+def soundex(token):
+    # american soundex code of a name token ("" for an empty token)
+    if not token:
+        return ''
+    code = token[0].upper()
+    last = _SOUNDEX.get(token[0], '')
+    for letter in token[1:]:
+        digit = _SOUNDEX.get(letter, '')
+        if digit and digit != last:
+            code += str(digit)
+        if letter not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def split_instructor(instructor):
+    """
+    :param instructor: a TRACE instructor ("Marchiori Pacheco, Larissa")
+    :return: the normalized (first names, last name)
+    """
+    last, _, first = str(instructor).partition(',')
+    if not first:
+        tokens = normalize_name(last).split()
+        return ' '.join(tokens[:-1]), last_name_of(' '.join(tokens[-1:]))
+    return normalize_name(first), last_name_of(last)
+
+
+def last_name_of(name):
+    # a normalized last name without suffixes like jr
+    return ' '.join(x for x in normalize_name(name).split() if x not in NAME_SUFFIXES)
+
+
+def block_keys(last_name):
+    """
+    :param last_name: a normalized last name
+    :return: the blocks it belongs to: each of its tokens, and the soundex code of each token
+    """
+    keys = set()
+    for token in last_name.split():
+        if len(token) > 1:
+            keys.add('t:' + token)
+            keys.add('s:' + soundex(token))
+    return keys
+
+
+def same_last_name(last_a, last_b):
+    """
+    :param last_a: a normalized last name
+    :param last_b: another normalized last name
+    :return: whether they share a token, or have tokens with the same soundex code that are spelled almost alike
+    """
+    for token_a in last_a.split():
+        for token_b in last_b.split():
+            if token_a == token_b:
+                return True
+            if soundex(token_a) == soundex(token_b) and \
+                    SequenceMatcher(None, token_a, token_b).ratio() >= SURNAME_RATIO:
+                return True
+    return False
+
+
+def score_names(first_a, last_a, first_b, last_b):
+    """
+    :param first_a: normalized first (and middle) names of one person
+    :param last_a: normalized last name of that person
+    :param first_b: normalized first (and middle) names of the other
+    :param last_b: normalized last name of the other
+    :return: how alike the two names are, from 0 to 1
+    """
+    last_score = SequenceMatcher(None, last_a, last_b).ratio()
+
+    # a first name can be shortened or come with a middle name on one side only; otherwise similar first names
+    # (patrick/patricia) are usually different people, so the score falls off quickly
+    first_tokens_a, first_tokens_b = first_a.split(), first_b.split()
+    if not first_tokens_a or not first_tokens_b:
+        first_score = 0.5
+    else:
+        first_a, first_b = (NICKNAMES.get(x, x) for x in [first_tokens_a[0], first_tokens_b[0]])
+        if first_a == first_b:
+            first_score = 1.0
+        elif first_a.startswith(first_b) or first_b.startswith(first_a):
+            first_score = 0.9
+        else:
+            first_score = SequenceMatcher(None, first_a, first_b).ratio() ** 3
+
+    return round(0.6 * last_score + 0.4 * first_score, 4)
+
+
+class NameCrosswalk:
+    def __init__(self, directory: str = "crosswalk"):
+        """
+        :param directory: where the crosswalk and the instructors it has seen are kept
+        """
+        self.directory = directory
+        self.path = os.path.join(directory, 'rmp_trace_crosswalk.csv')
+        self._state_path = os.path.join(directory, 'crosswalk_state.json')
+
+        # tid -> its crosswalk row; plus every trace instructor and every tid that has been scored so far
+        self.rows = {}
+        if os.path.exists(self.path):
+            for row in pd.read_csv(self.path, dtype={'instructor': 'string'}).to_dict('records'):
+                self.rows[int(row['tid'])] = row
+        self.seen_instructors = set()
+        self.scored_tids = set()
+        if os.path.exists(self._state_path):
+            with open(self._state_path) as state_file:
+                state = json.load(state_file)
+            self.seen_instructors = set(state['instructors'])
+            self.scored_tids = set(state['tids'])
+
+    def update(self, professors_df, instructors):
+        """
+        :param professors_df: the rate my professor output (ID, First Name, Middle Name, Last Name)
+        :param instructors: every TRACE instructor name
+        :return: the number of professors that were (re)scored
+        """
+        instructors = sorted({str(x).strip() for x in instructors if isinstance(x, str) and x.strip()})
+
+        # inverted index from block key to the instructors in that block
+        blocks = {}
+        names = {}
+        for instructor in instructors:
+            names[instructor] = split_instructor(instructor)
+            for key in block_keys(names[instructor][1]):
+                blocks.setdefault(key, []).append(instructor)
+
+        # only professors that are new, or that share a block with a new instructor, need scoring again
+        new_keys = set()
+        for instructor in set(instructors) - self.seen_instructors:
+            new_keys |= block_keys(names[instructor][1])
+
+        rescored = 0
+        for professor in professors_df.to_dict('records'):
+            tid = int(professor['ID'])
+            first = normalize_name(' '.join(str(professor.get(x) or '') for x in ['First Name', 'Middle Name']
+                                            if pd.notna(professor.get(x))))
+            last = last_name_of(professor['Last Name']) if pd.notna(professor['Last Name']) else ''
+            keys = block_keys(last)
+            if tid in self.scored_tids and not keys & new_keys:
+                continue
+
+            candidates = {instructor for key in keys for instructor in blocks.get(key, [])}
+            scored = sorted(((score_names(first, last, *names[x]), x) for x in candidates), reverse=True)
+            rescored += 1
+            self.scored_tids.add(tid)
+            if not scored or scored[0][0] < MATCH_THRESHOLD:
+                self.rows.pop(tid, None)
+                continue
+
+            # a close runner up, or a last name that only looks like the professor's, needs a person to check it
+            ambiguous = (len(scored) > 1 and scored[0][0] - scored[1][0] < AMBIGUITY_MARGIN) or \
+                not same_last_name(last, names[scored[0][1]][1])
+            self.rows[tid] = {'tid': tid, 'instructor': scored[0][1], 'score': scored[0][0], 'ambiguous': ambiguous}
+
+        self.seen_instructors |= set(instructors)
+        self.save()
+        return rescored
+
+    def save(self):
+        # the crosswalk, then what it has been scored against
+        os.makedirs(self.directory, exist_ok=True)
+        crosswalk_df = pd.DataFrame([self.rows[x] for x in sorted(self.rows)], columns=CROSSWALK_COLUMNS)
+        crosswalk_df.to_csv(self.path + '.tmp', index=False)
+        os.replace(self.path + '.tmp', self.path)
+        with open(self._state_path + '.tmp', 'w') as state_file:
+            json.dump({'instructors': sorted(self.seen_instructors), 'tids': sorted(self.scored_tids)}, state_file)
+        os.replace(self._state_path + '.tmp', self._state_path)
+
+    def instructor_of(self, tid):
+        # the TRACE instructor a rate my professor id was matched to, or None
+        row = self.rows.get(int(tid))
+        return row['instructor'] if row is not None else None
+
+
+def trace_instructors(pattern):
+    """
+    :param pattern: glob of cleaned TRACE csvs
+    :return: every distinct instructor in them
+    """
+    instructors = set()
+    for path in sorted(glob.glob(pattern)):
+        instructors |= set(pd.read_csv(path, usecols=['instructor'])['instructor'].dropna().str.strip())
+    return instructors
+
+
+if __name__ == '__main__':
+
+    # python name_crosswalk.py [<rmp csv> [<cleaned trace csv glob>]]
+    rmp_path = sys.argv[1] if len(sys.argv) > 1 else '../rmp/northeastern_rmp_data.csv'
+    trace_pattern = sys.argv[2] if len(sys.argv) > 2 else '../trace_survey/trace_data_stores/All *Trace Surveys.csv'
+
+    crosswalk = NameCrosswalk()
+    rescored = crosswalk.update(pd.read_csv(rmp_path), trace_instructors(trace_pattern))
+    print(f"Scored {rescored} Professors; {len(crosswalk.rows)} Matched to a TRACE Instructor!")
@@ -0,0 +1,240 @@
+"""
+File: search_index.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Prebuilt trigram search index over TRACE instructors/courses and Rate My Professor professors
+"""
+
+# import necessary libraries
+import glob
+import re
+import sys
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# what a search result can be
+KINDS = ['instructor', 'course', 'professor']
+
+# results have to contain at least this much of the query's trigrams
+MIN_SIMILARITY = 0.5
+
+
+def normalize_text(text):
+    """
+    :param text: a name, a course title or a query
+    :return: the text lowercased, without accents or punctuation, with single spaces (digits are kept, so
+    "Calculus 1" and "Calculus 2" stay apart)
+    """
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.sub(r"[^a-z0-9 ]+", ' ', text.casefold().replace("'", '')).split())
+
+
+def trigrams(text, closed=True):
+    """
+    :param text: normalized text
+    :param closed: whether the last word is finished (a query being typed isn't, so the trigram ending it is left
+                   out; "spe" would otherwise look for a word ending in "pe")
+    :return: the distinct trigrams of the text, padded so the start of every word counts most
+    """
+    padded = '  ' + text.replace(' ', '  ') + (' ' if closed else '')
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+class SearchIndex:
+    def __init__(self, texts, kinds, scores, counts):
+        """
+        :param texts: the text shown for each document
+        :param kinds: index into KINDS of each document
+        :param scores: what results with the same similarity are ranked by (mean score or rating)
+        :param counts: how many surveys/ratings each document's score comes from
+        """
+        self.texts = np.asarray(texts, dtype=str)
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        self.scores = np.nan_to_num(np.asarray(scores, dtype=np.float32), nan=-np.inf)
+        self.counts = np.asarray(counts, dtype=np.int32)
+
+        # trigram postings in one flat array (compressed sparse rows): the documents holding trigram k are
+        # postings[offsets[k]:offsets[k + 1]]
+        document_trigrams = [trigrams(normalize_text(x)) for x in self.texts]
+        self.trigram_counts = np.array([len(x) for x in document_trigrams], dtype=np.int16)
+        pairs = pd.DataFrame({
+            'trigram': [t for x in document_trigrams for t in x],
+            'document': np.repeat(np.arange(len(self.texts), dtype=np.int32), self.trigram_counts),
+        }).sort_values(['trigram', 'document'], kind='stable')
+        self.keys, starts = np.unique(pairs['trigram'].to_numpy(str), return_index=True)
+        self.offsets = np.append(starts, len(pairs)).astype(np.int64)
+        self.postings = pairs['document'].to_numpy(np.int32)
+        self._positions = {key: i for i, key in enumerate(self.keys.tolist())}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        # rebuild an index from the arrays save() wrote, without recomputing any postings
+        index = cls.__new__(cls)
+        for name in ['texts', 'kinds', 'scores', 'counts', 'trigram_counts', 'keys', 'offsets', 'postings']:
+            setattr(index, name, arrays[name])
+        index._positions = {key: i for i, key in enumerate(index.keys.tolist())}
+        return index
+
+    def save(self, path):
+        """
+        :param path: the .npz file the index is written to
+        :return: null
+        """
+        np.savez(path, texts=self.texts, kinds=self.kinds, scores=self.scores, counts=self.counts,
+                 trigram_counts=self.trigram_counts, keys=self.keys, offsets=self.offsets, postings=self.postings)
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: an .npz file written by save()
+        :return: the SearchIndex in it
+        """
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls.from_arrays({name: arrays[name] for name in arrays.files})
+
+    def search(self, query, kind=None, limit=10):
+        """
+        :param query: what was typed (a name, a course title, part of either)
+        :param kind: only results of this kind ('instructor', 'course' or 'professor')
+        :param limit: most results returned (None for every match)
+        :return: a list of (text, kind, similarity, score, count), best first
+        """
+        typed = trigrams(normalize_text(query), closed=False)
+        query_trigrams = [self._positions[x] for x in typed if x in self._positions]
+        if not query_trigrams:
+            return []
+
+        # count shared trigrams per document straight off of the postings
+        hits = np.bincount(np.concatenate([self.postings[self.offsets[k]:self.offsets[k + 1]]
+                                           for k in query_trigrams]), minlength=len(self.texts))
+        candidates = np.flatnonzero(hits)
+        if kind is not None:
+            candidates = candidates[self.kinds[candidates] == KINDS.index(kind)]
+
+        # how much of the query a document covers, so a prefix matches the long name it starts; among equally
+        # covering documents the closest one (by jaccard similarity) comes first, then the best scored
+        shared = hits[candidates]
+        similarity = shared / len(typed)
+        keep = similarity >= MIN_SIMILARITY
+        candidates, similarity, shared = candidates[keep], similarity[keep], shared[keep]
+        jaccard = shared / (len(typed) + self.trigram_counts[candidates] - shared)
+
+        order = np.lexsort((-self.scores[candidates], -jaccard, -similarity))[:limit]
+        return [(str(self.texts[i]), KINDS[self.kinds[i]], round(float(s), 3), float(self.scores[i]),
+                 int(self.counts[i])) for i, s in zip(candidates[order], similarity[order])]
+
+
+def build_index(trace_pattern, rmp_path=None):
+    """
+    :param trace_pattern: glob of cleaned TRACE csvs (instructor, course_title, course_id, professor_score)
+    :param rmp_path: the rate my professor output csv (left out if None)
+    :return: a SearchIndex over every instructor, course and professor
+    """
+    scores_df = pd.concat([pd.read_csv(x, usecols=['instructor', 'course_title', 'professor_score'])
+                           for x in sorted(glob.glob(trace_pattern))], ignore_index=True)
+    for column in ['instructor', 'course_title']:
+        scores_df[column] = scores_df[column].str.strip()
+
+    # one document per instructor and per course, ranked by their mean score
+    parts = []
+    for kind, column in [('instructor', 'instructor'), ('course', 'course_title')]:
+        summary_df = scores_df.groupby(column)['professor_score'].agg(['mean', 'count']).reset_index()
+        parts.append(pd.DataFrame({'text': summary_df[column], 'kind': KINDS.index(kind),
+                                   'score': summary_df['mean'], 'count': summary_df['count']}))
+
+    # one per rate my professor professor, ranked by their average rating
+    if rmp_path is not None:
+        rmp_df = pd.read_csv(rmp_path)
+        names = rmp_df['First Name'].fillna('').astype(str).str.strip() + ' ' + \
+            rmp_df['Last Name'].fillna('').astype(str).str.strip()
+        parts.append(pd.DataFrame({'text': names.str.strip(), 'kind': KINDS.index('professor'),
+                                   'score': pd.to_numeric(rmp_df['Average Rating (Out of 5)'], errors='coerce'),
+                                   'count': pd.to_numeric(rmp_df['Number of Ratings'], errors='coerce')
+                                   .fillna(0)}))
+
+    documents_df = pd.concat(parts, ignore_index=True)
+    documents_df = documents_df[documents_df['text'].str.len() > 0]
+    return SearchIndex(documents_df['text'], documents_df['kind'], documents_df['score'], documents_df['count'])
+
+
+def benchmark(index, queries, repeat=3):
+    """
+    :param index: a SearchIndex
+    :param queries: queries to time
+    :param repeat: how many times each query is run (the best time is kept)
+    :return: the 50th, 95th and 99th percentile latency in milliseconds
+    """
+    latencies = []
+    for query in queries:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            index.search(query)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best * 1000)
+    return np.percentile(latencies, [50, 95, 99])
+
+
+def prefix_queries(index, texts, lengths=(3, 6, 12)):
+    """ Cuts queries the way typing does and checks every one of them matches the text it was cut from
+    :param index: a SearchIndex
+    :param texts: texts of the index to type
+    :param lengths: how much of each text is typed
+    :return: the queries
+    """
+    queries, missed = [], []
+    for text in texts:
+        for n in lengths:
+            query = str(text)[:n]
+            if str(text) not in [x[0] for x in index.search(query, limit=None)]:
+                missed.append((query, str(text)))
+            queries.append(query)
+    if missed:
+        raise ValueError(f"{len(missed)} queries don't find the text they were typed from, e.g. {missed[0]}")
+    return queries
+
+
+def check_numbered_titles(index):
+    """ Checks that every course title with a number in it finds itself first (and not the same title with
+    another number)
+    :param index: a SearchIndex
+    :return: how many titles were checked
+    """
+    titles = [str(x) for x, kind in zip(index.texts, index.kinds)
+              if kind == KINDS.index('course') and re.search(r'[0-9]', str(x))]
+    wrong = []
+    for title in titles:
+        results = index.search(title, kind='course', limit=1)
+        if not results or normalize_text(results[0][0]) != normalize_text(title):
+            wrong.append((title, results[0][0] if results else None))
+    if wrong:
+        raise ValueError(f"{len(wrong)} numbered titles don't rank themselves first, e.g. {wrong[0]}")
+    return len(titles)
+
+
+if __name__ == '__main__':
+
+    # python search_index.py [<cleaned trace csv glob> [<rmp csv>]]
+    trace_pattern = sys.argv[1] if len(sys.argv) > 1 else '../trace_survey/trace_data_stores/All *Trace Surveys.csv'
+    rmp_path = sys.argv[2] if len(sys.argv) > 2 else None
+
+    start = time.perf_counter()
+    search_index = build_index(trace_pattern, rmp_path)
+    search_index.save('search_index.npz')
+    print(f"Indexed {len(search_index.texts)} Names and Courses in {time.perf_counter() - start:.2f}s!")
+
+    # time what typing looks like: growing prefixes of real names and titles
+    start = time.perf_counter()
+    search_index = SearchIndex.load('search_index.npz')
+    print(f"Loaded the Index in {(time.perf_counter() - start) * 1000:.1f}ms")
+    sample = np.random.default_rng(0).choice(search_index.texts, size=min(200, len(search_index.texts)),
+                                             replace=False)
+    queries = prefix_queries(search_index, sample)
+    print(f"Checked {check_numbered_titles(search_index)} Numbered Course Titles!")
+    p50, p95, p99 = benchmark(search_index, queries)
+    print(f"{len(queries)} queries: p50 {p50:.3f}ms, p95 {p95:.3f}ms, p99 {p99:.3f}ms")
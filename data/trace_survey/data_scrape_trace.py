@@ -6,210 +6,550 @@ Description: Scrapes necessary trace_data_stores from Northeastern's Trace Surve
 """
 
 # import necessary libraries
-from playwright.sync_api import sync_playwright, Playwright
+from playwright.sync_api import (sync_playwright, Playwright, Error as PlaywrightError,
+                                 TimeoutError as PlaywrightTimeoutError)
 import pandas as pd
 from bs4 import BeautifulSoup
+import getpass
+import json
+import os
 import requests
+import sys
 import time
+from urllib.parse import urlparse
+
+# run as a script, the shared modules under data/ have to be importable (a script importing this one has
+# already set that up)
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.run_metrics import RunMetrics
+
+
+# svg groups holding a chart's question labels and its mean bars
+QUESTIONS_SELECTOR = '[id^="bar_mean_55_"] > div > div:nth-child(1) > div > svg > g:nth-child(4) > g:nth-child(4)'
+RATINGS_SELECTOR = '[id^="bar_mean_55_"] > div > div:nth-child(1) > div > svg > g:nth-child(4) > g:nth-child(5)'
+
+# reads the course details and every chart of a survey in one go; the first six question groups are axis
+# labels, and every third rating group is a mean (professor means first, then department means)
+SURVEY_EXTRACTION_SCRIPT = """() => {
+    const firstText = (g) => {
+        const text = g ? g.querySelector('text') : null;
+        return text ? text.textContent.trim() : '';
+    };
+    const groups = (chart, selector) => Array.from(chart.querySelectorAll(selector))
+        .flatMap((element) => Array.from(element.querySelectorAll('g')));
+
+    const details = Array.from(document.querySelectorAll('ul.list-unstyled li')).map((li) => li.textContent);
+    const container = document.querySelector('#chart_55');
+    const charts = Array.from(container ? container.querySelectorAll('div[id^="chart_"]') : []).map((chart) => {
+        const questions = groups(chart, '%s').slice(6).map(firstText).filter((text) => text);
+        const ratingGroups = groups(chart, '%s');
+        const ratings = [];
+        for (let i = 0; i < 6 * questions.length; i += 3) {
+            ratings.push(firstText(ratingGroups[i]));
+        }
+        return {questions: questions, ratings: ratings};
+    });
+    return {details: details, charts: charts};
+}""" % (QUESTIONS_SELECTOR, RATINGS_SELECTOR)
+
+# the trace survey browser (behind the university's shibboleth login)
+TRACE_URL = 'https://www.applyweb.com/eval/shibboleth/neu/36892'
+
+# the signed in session is saved here and reused until it is too old or the site stops accepting it
+STORAGE_STATE_PATH = 'trace_storage_state.json'
+SESSION_MAX_AGE = 8 * 60 * 60
+
+# environment variables the logins read their credentials from (asked for on the terminal when they aren't set)
+SSO_USERNAME_ENV = 'TRACE_SSO_USERNAME'
+SSO_PASSWORD_ENV = 'TRACE_SSO_PASSWORD'
+TRACE_USERNAME_ENV = 'TRACE_USERNAME'
+TRACE_PASSWORD_ENV = 'TRACE_PASSWORD'
+
+# resources the extractor never looks at (the charts are drawn by javascript, so scripts have to load)
+BLOCKED_RESOURCE_TYPES = {'image', 'font', 'stylesheet', 'media'}
+
+# the results table and its page links (the large screen copy of them)
+PAGINATION_SELECTOR = 'div.col-sm-12.hidden-xs'
+RESULTS_STATE_SCRIPT = """() => {
+    const active = document.querySelector('%s li.pagination-page.active a');
+    const rows = Array.from(document.querySelectorAll('table#resultTable tbody tr'));
+    return {
+        active: active ? parseInt(active.textContent.trim(), 10) : null,
+        links: rows.map((row) => row.querySelector('a')).filter((a) => a).map((a) => a.href),
+    };
+}""" % PAGINATION_SELECTOR
+
+
+def saved_session_state(state_path=STORAGE_STATE_PATH, max_age=SESSION_MAX_AGE):
+    """
+    :param state_path: where a previous run saved its session
+    :param max_age: seconds a saved session is trusted for
+    :return: the path of the saved session if there is a recent enough one, otherwise None
+    """
+    if os.path.exists(state_path) and time.time() - os.path.getmtime(state_path) < max_age:
+        return state_path
+    return None
+
+
+def block_resources(route):
+    # drop what the extractor doesn't need, pass everything else on (to a replay route if there is one)
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.fallback()
+
+
+def new_trace_context(browser, storage_state=None, replay_har=None, record_har=None, metrics=None):
+    """
+    :param browser: a launched playwright browser
+    :param storage_state: a saved session to start signed in with
+    :param replay_har: a recorded har file to serve every request from instead of the network
+    :param record_har: a har file to record the run into (for replaying it later)
+    :param metrics: a RunMetrics every finished browser request is recorded in
+    :return: a browser context that skips images, fonts, stylesheets and media
+    """
+    context = browser.new_context(storage_state=storage_state, record_har_path=record_har)
+    if replay_har is not None:
+        context.route_from_har(replay_har, not_found='abort')
+
+    # routes run newest first, so resources are dropped before they ever reach the replay
+    context.route('**/*', block_resources)
+    if metrics is not None:
+        context.on('requestfinished', lambda request: record_request(metrics, request))
+        context.on('requestfailed', lambda request: record_request(metrics, request, ok=False))
+    return context
 
 
-def access_trace_surveys(url):
+def record_request(metrics, request, ok=True):
+    """
+    :param metrics: a RunMetrics
+    :param request: a finished (or failed) playwright request
+    :param ok: whether the request finished
+    :return: null
+    """
+    # resources we abort on purpose aren't failures
+    if not ok and request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return
+
+    # timings are milliseconds from the request's start; -1 when the browser didn't measure them
+    seconds = max(0, request.timing.get('responseEnd', 0)) / 1000
+    size = 0
+    if ok:
+        try:
+            size = request.sizes()['responseBodySize']
+        except PlaywrightError:
+            pass
+    metrics.observe_request(request.url, seconds, size, ok=ok)
+
+
+def on_trace_host(url):
+    # whether a url is on the trace survey site itself (a login redirect can carry it in a query parameter)
+    hostname = urlparse(url).hostname or ''
+    return hostname == 'applyweb.com' or hostname.endswith('.applyweb.com')
+
+
+def open_trace_browser(context):
+    """
+    :param context: a browser context started from a saved session
+    :return: a tab on the trace survey browser, or None if the session has expired and a login is needed
+    """
+    trace_tab = context.new_page()
+    trace_tab.goto(TRACE_URL)
+    trace_tab.wait_for_load_state()
+
+    # an expired session gets sent back to the login page
+    if on_trace_host(trace_tab.url) and trace_tab.locator('#username').count() == 0:
+        print("Reusing the Saved Session!")
+        return trace_tab
+    trace_tab.close()
+    return None
+
+
+def replay_surveys(urls, replay_har=None, tabs=4):
+    """ Scrapes surveys without logging in, from a recorded har or from a locally served copy of the pages
+    :param urls: trace survey urls (as recorded, or pointing at the local copy)
+    :param replay_har: the har file to serve the pages from (None to load the urls as they are)
+    :param tabs: how many survey tabs load at the same time
+    :return: a dataframe with a row per survey
+    """
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = new_trace_context(browser, replay_har=replay_har)
+        survey_pool = SurveyTabPool(context, tabs)
+        data = survey_pool.scrape(urls)
+        survey_pool.close()
+        context.close()
+        browser.close()
+    return pd.DataFrame(data)
+
+
+def credential(variable, prompt, secret=False):
+    """
+    :param variable: the environment variable holding the value
+    :param prompt: what to ask for when it isn't set
+    :param secret: don't echo what is typed
+    :return: the value
+    """
+    value = os.environ.get(variable)
+    if value:
+        return value
+    return getpass.getpass(f"{prompt}: ") if secret else input(f"{prompt}: ")
+
+
+def log_in(context, url):
+    """ Goes through the SSO and Duo logins into the trace survey browser
+    :param context: the playwright context to log in
+    :param url: the student hub url
+    :return: the tab with the trace survey browser open
+    """
+
+    page = context.new_page()
+    page.goto(url)
+
+    # fill in the university sign in (read from the environment, or asked for on the terminal)
+    page.wait_for_selector('#i0116')
+    page.fill('#i0116', credential(SSO_USERNAME_ENV, 'University Email'))
+    page.click('#idSIButton9')
+    page.wait_for_selector('#i0118')
+    page.fill('#i0118', credential(SSO_PASSWORD_ENV, 'University Password', secret=True))
+    page.click('#idSIButton9')
+
+    # do two-factor authentication and then click okay button
+    page.wait_for_selector('#trust-browser-button')
+    page.click('#trust-browser-button')
+
+    # click a further button to get into student hub
+    page.wait_for_selector('#idSIButton9[value="Yes"]')
+    page.click('#idSIButton9[value="Yes"]')
+
+    # get on the trace surveys link from student hub and open new tab
+    print("Into the Student Hub!")
+    page.wait_for_selector('a[href="/resources/"]')
+    page.click('a[href="/resources/"]')
+    with page.expect_popup() as popup_info:
+        page.click('a[href="https://www.applyweb.com/eval/shibboleth/neu/36892"]')
+    trace_tab = popup_info.value
+    trace_tab.wait_for_load_state()
+
+    # do another login, with the trace (shibboleth) credentials
+    trace_tab.wait_for_selector('#username')
+    trace_tab.fill('#username', credential(TRACE_USERNAME_ENV, 'TRACE Username'))
+    trace_tab.fill('#password', credential(TRACE_PASSWORD_ENV, 'TRACE Password', secret=True))
+    trace_tab.click('button[name="_eventId_proceed"]')
+
+    # do another duo authentication
+    trace_tab.wait_for_selector('iframe#duo_iframe')
+    iframe = trace_tab.frame(name="duo_iframe")
+    iframe.locator('button:has-text("Send Me a Push")').click()
+
+    # wait for the duo push to be accepted
+    trace_tab.wait_for_url(on_trace_host, timeout=120000)
+    return trace_tab
+
+
+def access_trace_surveys(url, terms=None, tabs=4, state_path=STORAGE_STATE_PATH, record_har=None, metrics=None):
     """ Accesses the Northeastern Trace Surveys
     :param url: a given url
+    :param terms: names of the terms to scrape (every non law term if None)
+    :param tabs: how many survey tabs load at the same time
+    :param state_path: where the signed in session (cookies and local storage) is kept between runs
+    :param record_har: a har file to record the run into, for replay_surveys
+    :param metrics: where stage times, survey latencies and progress are recorded (printed only if not given)
     :return: null
     """
+    metrics = metrics if metrics is not None else RunMetrics()
 
     # access the given url
     with sync_playwright() as p:
 
-        # go to the Northeastern page
-        browser = p.chromium.launch(headless=True, slow_mo=50)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto(url)
-
-        # fill in my username and password (username and password hidden)
-        page.wait_for_selector('#i0116')
-        page.fill('#i0116', '')
-        page.click('#idSIButton9')
-        page.wait_for_selector('#i0118')
-        page.fill('#i0118', '')
-        page.click('#idSIButton9')
-
-        # do two-factor authentication and then click okay button
-        page.wait_for_selector('#trust-browser-button')
-        page.click('#trust-browser-button')
-
-        # click a further button to get into student hub
-        page.wait_for_selector('#idSIButton9[value="Yes"]')
-        page.click('#idSIButton9[value="Yes"]')
-
-        # get on the trace surveys link from student hub and open new tab
-        print("Into the Student Hub!")
-        page.wait_for_selector('a[href="/resources/"]')
-        page.click('a[href="/resources/"]')
-        with page.expect_popup() as popup_info:
-            page.click('a[href="https://www.applyweb.com/eval/shibboleth/neu/36892"]')
-        trace_tab = popup_info.value
-        trace_tab.wait_for_load_state()
-
-        # do another login
-        trace_tab.wait_for_selector('#username')
-        trace_tab.fill('#username', 'sharpe.o')
-        trace_tab.fill('#password', 'TracyMcgrady21!')
-        trace_tab.click('button[name="_eventId_proceed"]')
-
-        # do another duo authentication
-        trace_tab.wait_for_selector('iframe#duo_iframe')
-        iframe = trace_tab.frame(name="duo_iframe")
-        iframe.locator('button:has-text("Send Me a Push")').click()
-
-        # get into the dropdown menu
-        print("Into the Trace Survey Browser!")
-        time.sleep(5)
-        trace_tab.wait_for_load_state('networkidle')
-        trace_tab.click('li[class="dropdown"] > a[class="dropdown-toggle"]')
-
-        # get into reports browser
-        trace_tab.wait_for_timeout(2000)
-        trace_tab.click('a[href="reportbrowser"]')
-
-        # get into the content selection iframe
-        trace_tab.wait_for_load_state('networkidle')
-        trace_tab.wait_for_selector('iframe#contentFrame', timeout=3000)
-        content_frame = trace_tab.frame(name='contentFrame')
-
-        # get all the trace surveys terms
-        select_element = content_frame.locator('select[id="TermSelect"]')
-        options = select_element.locator('option')
-        all_surveys = options.element_handles()
-
-        # we need to filter out the law terms
-        filtered_terms = []
-        for survey in all_surveys[1:]:
-            term_name = survey.evaluate('(node) => node.textContent')
-            if 'LAW' not in term_name and 'Law' not in term_name and 'MLS' not in term_name:
-                filtered_terms.append(survey)
-        print(f"Filtered Out Law Terms!\n")
-
-
-        # go term by term, and scrape each page of trace surveys (currently doing sixth section)
+        # go to the trace survey browser, reusing the last run's session while it is still signed in
+        browser = p.chromium.launch(headless=True)
+        context = new_trace_context(browser, saved_session_state(state_path), record_har=record_har,
+                                    metrics=metrics)
+        with metrics.stage('sign_in'):
+            trace_tab = sign_in(context, url, state_path)
+            content_frame = open_report_browser(trace_tab)
+
+        # go term by term, and scrape each page of trace surveys
         data = []
-        for term in filtered_terms[35:42]:
-            print(f"On Term: {term.evaluate('(node) => node.textContent')}")
-            term.click()
-
-            # let surveys load
-            time.sleep(2)
-
-            try:
-                # find the '1' page element
-                page_1_locator = content_frame.locator(
-                    'div.col-sm-12.hidden-xs li.pagination-page a:text-is("1")').first
-
-                # check if '1' page exists
-                page_1_count = page_1_locator.count()
-
-                if page_1_count > 0:
-                    # check if '1' page is active
-                    parent_class = page_1_locator.locator('..').get_attribute("class")
-                    if "active" in parent_class:
-                        print("Page 1 is active, no further action needed.")
-                    else:
-                        print("Page 1 is visible but not active. Clicking to activate it.")
-                        page_1_locator.click()
-                        content_frame.wait_for_load_state('networkidle')
-                        time.sleep(1)
-                else:
-                    # if page '1' is not found, click 'Previous' until we get to the first page
-                    print("Going to click 'Previous' until we find the '1' tab.")
-                    while True:
-                        # Find the first "Previous" button within the 'hidden-xs' div
-                        previous_button_li = content_frame.locator('div.col-sm-12.hidden-xs li.pagination-prev').filter(
-                            has_text="Previous").first
-
-                        # check if 'Previous' is disabled
-                        if "disabled" in previous_button_li.get_attribute("class"):
-                            print("Reached the start, but couldn't find page '1'.")
-                            break
-
-                        # click the "Previous" button to go back a page
-                        previous_button_li.locator('a').click()
-                        content_frame.wait_for_load_state('networkidle')
-                        time.sleep(1)
-
-                        # after clicking "Previous", check if '1' page is now visible
-                        temp_pg1_locator = content_frame.locator(
-                            'div.col-sm-12.hidden-xs li.pagination-page a:text-is("1")').first
-
-                        # if we now see the '1' page
-                        if temp_pg1_locator.count() > 0:
-                            print("Page 1 is now visible. Clicking to activate it.")
-                            temp_pg1_locator.click()
-                            content_frame.wait_for_load_state('networkidle')
-                            break
-            except Exception as e:
-                print(f"Error resetting pagination: {e}")
-
-            # while we still have surveys to scrape
-            time.sleep(2)
-            page_count = 1
-            while 1:
-                print(f'At Page #{page_count}')
-                content_frame.wait_for_load_state('networkidle')
-
-                # obtain rows
-                survey_table = content_frame.locator('table#resultTable')
-                rows = survey_table.locator('tbody tr')
-
-                # get the 'href' links from each row
-                temp_links = ['https://www.applyweb.com' + row.query_selector_all('a')[0].get_attribute('href') for row
-                                in rows.element_handles()]
-
-                # get the trace_data_stores in each link
-                for link in temp_links:
-                    data.append(get_survey_content(context, link))
-
-                # try to go to next page
-                next_button = content_frame.locator('ul.pagination').locator('li.pagination-next:not(.disabled) a').nth(0)
-                if next_button.count() > 0:
-                    next_button.click()
-                    page_count += 1
-                    time.sleep(2)
-                else:
-                    print("No more pages left to scrape.\n")
-                    break
+        survey_pool = SurveyTabPool(context, tabs, metrics)
+        terms = terms if terms is not None else list_terms(content_frame)
+        metrics.set_total('terms', len(terms))
+        for term in terms:
+            with metrics.stage('select_term'):
+                select_term(content_frame, term)
+            for page_count, rows in scrape_term(content_frame, survey_pool):
+                data.extend(rows)
+            metrics.add_items('terms')
+        survey_pool.close()
+        context.close()
         browser.close()
+    metrics.report()
+    metrics.close()
     return pd.DataFrame(data)
 
 
-def get_survey_content(chr_context, url):
+def sign_in(context, url, state_path=STORAGE_STATE_PATH):
+    """
+    :param context: a browser context (possibly started from a saved session)
+    :param url: the student hub url, in case a full login is needed
+    :param state_path: where the signed in session is saved for the next run
+    :return: a tab on the trace survey browser
+    """
+    trace_tab = open_trace_browser(context)
+    if trace_tab is None:
+        trace_tab = log_in(context, url)
+    context.storage_state(path=state_path)
+    return trace_tab
+
+
+def open_report_browser(trace_tab):
+    """
+    :param trace_tab: a tab on the trace survey browser
+    :return: the report browser's content frame
+    """
+
+    # get into the dropdown menu
+    print("Into the Trace Survey Browser!")
+    trace_tab.click('li[class="dropdown"] > a[class="dropdown-toggle"]')
+
+    # get into reports browser (clicks wait for their element to be visible and enabled on their own)
+    trace_tab.click('a[href="reportbrowser"]')
+
+    # get into the content selection iframe, once its term list is there
+    trace_tab.wait_for_selector('iframe#contentFrame', timeout=30000)
+    content_frame = trace_tab.frame(name='contentFrame')
+    content_frame.wait_for_selector('select[id="TermSelect"] option', state='attached', timeout=30000)
+    return content_frame
+
+
+def list_terms(content_frame):
+    """
+    :param content_frame: the report browser's content frame
+    :return: the names of every term, without the law terms
+    """
+
+    # get all the trace surveys terms
+    select_element = content_frame.locator('select[id="TermSelect"]')
+    options = select_element.locator('option')
+    all_surveys = options.element_handles()
+
+    # we need to filter out the law terms
+    filtered_terms = []
+    for survey in all_surveys[1:]:
+        term_name = survey.evaluate('(node) => node.textContent')
+        if 'LAW' not in term_name and 'Law' not in term_name and 'MLS' not in term_name:
+            filtered_terms.append(term_name.strip())
+    print(f"Filtered Out Law Terms!\n")
+    return filtered_terms
+
+
+def select_term(content_frame, term):
+    """
+    :param content_frame: the report browser's content frame
+    :param term: the name of the term to show the surveys of
+    :return: null
+    """
+    print(f"On Term: {term}")
+    paginator = TracePaginator(content_frame)
+    before = paginator.state()
+    content_frame.locator('select[id="TermSelect"]').select_option(label=term)
+
+    # let the new term's surveys replace the old ones; a term with no surveys never shows any links, so
+    # running out of time is only an error if the old term's links are still the ones on screen
+    try:
+        paginator.wait_for_change(before)
+    except PlaywrightTimeoutError:
+        links = paginator.links()
+        if links and links == json.loads(before)['links']:
+            raise
+
+
+class TracePaginator:
+    def __init__(self, content_frame, timeout: float = 30000):
+        """
+        :param content_frame: the report browser's content frame
+        :param timeout: milliseconds to wait for a page of results to show up
+        """
+        self.content_frame = content_frame
+        self.timeout = timeout
+
+        # the page links are shown twice (for small and large screens); only the large screen ones are used
+        self.pagination = content_frame.locator(f'{PAGINATION_SELECTOR} ul.pagination').first
+
+    def state(self):
+        # the active page and the survey links in the table, as one string
+        return self.content_frame.evaluate(f'() => JSON.stringify(({RESULTS_STATE_SCRIPT})())')
+
+    def wait_for_change(self, before, page_number=None):
+        """ Waits for a new set of survey links; the active page link flips before the table is swapped out,
+        so a change of page alone doesn't count
+        :param before: the state() from before the click/selection
+        :param page_number: the page that also has to end up active (None for any page)
+        :return: null
+        """
+        self.content_frame.wait_for_function(
+            f"""([before, pageNumber]) => {{
+                const state = ({RESULTS_STATE_SCRIPT})();
+                const links = JSON.stringify(state.links);
+                return state.links.length > 0 && links !== JSON.stringify(JSON.parse(before).links)
+                    && (pageNumber === null || state.active === pageNumber);
+            }}""", arg=[before, page_number], timeout=self.timeout)
+
+    def active_page(self):
+        # the page of results being shown
+        return json.loads(self.state())['active']
+
+    def visible_pages(self):
+        # the page numbers there are links for right now
+        return [int(x) for x in self.pagination.locator('li.pagination-page a').all_text_contents()
+                if x.strip().isdigit()]
+
+    def links(self):
+        # the survey url of every row on the current page, read in one go
+        return json.loads(self.state())['links']
+
+    def _click(self, link, page_number=None):
+        # click a pagination link and wait until its results have actually replaced the old ones
+        before = self.state()
+        link.click()
+        self.wait_for_change(before, page_number)
+
+    def next(self):
+        """
+        :return: False if this was the last page, otherwise moves to the next page and returns True
+        """
+        next_button = self.pagination.locator('li.pagination-next:not(.disabled) a')
+        if next_button.count() == 0:
+            return False
+        active = self.active_page()
+        self._click(next_button.first, active + 1 if active is not None else None)
+        return True
+
+    def go_to(self, page_number):
+        """
+        :param page_number: the page of results to move to
+        :return: the page that was reached (lower than page_number if there are fewer pages)
+        """
+
+        # jump as far as the visible links allow each time, instead of going a page at a time
+        active = self.active_page()
+        while active is not None and active != page_number:
+            visible = self.visible_pages()
+            if page_number in visible:
+                target = page_number
+            elif page_number > active:
+                target = max(visible + [active])
+            else:
+                target = min(visible + [active])
+
+            # the links don't reach any further; step once with next/previous instead
+            if target == active:
+                step = 'li.pagination-next' if page_number > active else 'li.pagination-prev'
+                button = self.pagination.locator(f'{step}:not(.disabled) a')
+                if button.count() == 0:
+                    break
+                target = active + 1 if page_number > active else active - 1
+                self._click(button.first, target)
+            else:
+                self._click(self.pagination.locator(f'li.pagination-page a:text-is("{target}")').first, target)
+            active = target
+
+        return active
+
+
+def scrape_term(content_frame, survey_pool, start_page=1):
+    """
+    :param content_frame: the report browser's content frame, with a term selected
+    :param survey_pool: the SurveyTabPool the surveys are read with
+    :param start_page: the first page to scrape (earlier pages are skipped over)
+    :return: yields (page number, survey rows) for each page of the term
+    """
+
+    # jump straight to the first page we need (nothing to do if the term ends before it)
+    metrics = survey_pool.metrics
+    paginator = TracePaginator(content_frame)
+    with metrics.stage('pagination'):
+        page_count = paginator.go_to(start_page) or 1
+    if page_count < start_page:
+        return
+
+    # while we still have surveys to scrape
+    while 1:
+        print(f'At Page #{page_count}')
+
+        # get the trace_data_stores in each link, several tabs at a time
+        yield page_count, survey_pool.scrape(paginator.links())
+        metrics.add_items('pages')
+
+        # try to go to next page
+        with metrics.stage('pagination'):
+            has_next = paginator.next()
+        if has_next:
+            page_count += 1
+        else:
+            print("No more pages left to scrape.\n")
+            break
+
+
+def get_survey_content(chr_context, url, metrics=None):
     """
     :param chr_context: the playwright context object to be able to open a new tab
     :param url: the url for the trace survey
+    :param metrics: where the survey's load and read times are recorded
     :return: html content trace_data_stores
     """
+    metrics = metrics if metrics is not None else RunMetrics(verbose=False)
+    start = time.perf_counter()
 
     # open a new tab for the survey url and go to the url
     new_tab = chr_context.new_page()
-    new_tab.goto(url)
+    with metrics.stage('navigation'):
+        new_tab.goto(url)
+    row = read_survey(new_tab, metrics=metrics)
+
+    # exit out the tab
+    new_tab.close()
+    metrics.observe('survey', time.perf_counter() - start)
+    metrics.add_items('surveys')
+
+    return row
+
+
+def read_survey(tab, timeout=3000, metrics=None):
+    """
+    :param tab: a playwright page that has been sent to a trace survey url
+    :param timeout: milliseconds to wait for the survey iframe once the page has loaded
+    :param metrics: where the time spent waiting on the browser and extracting is recorded
+    :return: the row of the survey (course details and question rating differences)
+    """
+    metrics = metrics if metrics is not None else RunMetrics(verbose=False)
 
     # wait for the iframe to load
-    new_tab.wait_for_selector('iframe#contentFrame', timeout=3000)
+    with metrics.stage('browser_wait'):
+        tab.wait_for_load_state()
+        tab.wait_for_selector('iframe#contentFrame', timeout=timeout)
 
-    # access iframe content by switching to the iframe context
-    content_frame = new_tab.frame(name='contentFrame')
+        # access iframe content by switching to the iframe context
+        content_frame = tab.frame(name='contentFrame')
+        content_frame.wait_for_selector('ul.list-unstyled', timeout=5000)
 
-    # first get the course details
-    course_details_selector = 'ul.list-unstyled'
-    content_frame.wait_for_selector(course_details_selector, timeout=5000)
-    course_details_element = content_frame.locator(course_details_selector)
-    course_details = {}
-    course_list_items = course_details_element.locator('li')
-    for item in course_list_items.element_handles():
+    # everything is read in one evaluation inside the page instead of one round trip per element
+    with metrics.stage('extract'):
+        return survey_row(content_frame.evaluate(SURVEY_EXTRACTION_SCRIPT))
 
-        # get the text content and split to get key-value pairs
-        content = item.text_content()
+
+def survey_row(survey):
+    """
+    :param survey: what SURVEY_EXTRACTION_SCRIPT returns for a survey ({'details': [...], 'charts': [...]})
+    :return: the row of the survey (course details and question rating differences)
+    """
+
+    # course details come as "Key: value" lines
+    course_details = {}
+    for content in survey['details']:
         if ':' in content:
             key, value = content.split(':', 1)
             course_details[key.strip()] = value.strip().replace("<strong>", "").replace("</strong>", "")
@@ -222,42 +562,10 @@ def get_survey_content(chr_context, url):
         'Course ID': course_details.get("Course ID", "N/A")
     }
 
-    # locate the parent div containing all charts
-    chart_container = content_frame.locator('#chart_55')
-
-    # get all individual chart divs within this container
-    chart_divs = chart_container.locator('div[id^="chart_"]')
-
-    # iterate over each chart div to extract questions and values
-    for i in range(chart_divs.count()):
-        chart_div = chart_divs.nth(i)
-
-        questions_selector = '[id^="bar_mean_55_"] > div > div:nth-child(1) > div > svg > g:nth-child(4) > g:nth-child(4)'
-        ratings_selector = '[id^="bar_mean_55_"] > div > div:nth-child(1) > div > svg > g:nth-child(4) > g:nth-child(5)'
-
-        # get the survey questions
-        questions_element = chart_div.locator(questions_selector)
-        question_groups = questions_element.locator('g')
-        questions = []
-        for i in range(6, question_groups.count()):
-            question_g = question_groups.nth(i)
-            question_text_element = question_g.locator('text').first
-            question_text = question_text_element.text_content().strip()
-            if question_text:
-                questions.append(question_text)
-
-
-        # get the survey ratings
-        ratings_element = chart_div.locator(ratings_selector)
-        rating_groups = ratings_element.locator('g')
-        ratings = []
-        for i in range(0, 6*len(questions), 3):
-            rating_g = rating_groups.nth(i)
-            rating_text_element = rating_g.locator('text').first
-            rating_text = rating_text_element.text_content().strip()
-            ratings.append(float(rating_text))
-
-        # get professor and department means
+    # each chart has its questions, then the professor means followed by the department means
+    for chart in survey['charts']:
+        questions = chart['questions']
+        ratings = [float(x) for x in chart['ratings']]
         professor_means = ratings[:len(questions)]
         department_means = ratings[len(questions):]
 
@@ -266,14 +574,58 @@ def get_survey_content(chr_context, url):
             rating_difference = round(professor_means[i] - department_means[i], 1)
             row[question] = rating_difference
 
-    # exit out the tab
-    new_tab.close()
-
     return row
 
 
+class SurveyTabPool:
+    def __init__(self, context, size: int = 4, metrics: RunMetrics = None):
+        """
+        :param context: the authenticated playwright context the tabs are opened in
+        :param size: how many surveys are loading at the same time
+        :param metrics: where survey latencies and stage times are recorded
+        """
+        self.context = context
+        self.metrics = metrics if metrics is not None else RunMetrics(verbose=False)
+
+        # the tabs are opened once and reused for every survey
+        self.tabs = [context.new_page() for _ in range(max(1, size))]
+
+    def scrape(self, urls):
+        """
+        :param urls: trace survey urls
+        :return: the row of every survey, in the same order as the urls
+        """
+        urls = list(urls)
+        rows = []
+
+        # every tab starts loading a survey; while one is being read the others keep loading in the browser,
+        # and as soon as a tab is read it is sent off to the next survey that hasn't been started
+        # (a survey's latency runs from when its tab was sent to it until it has been read)
+        started = {}
+        with self.metrics.stage('navigation'):
+            for i, url in enumerate(urls[:len(self.tabs)]):
+                started[i] = time.perf_counter()
+                self.tabs[i].goto(url, wait_until='commit')
+        for i in range(len(urls)):
+            tab = self.tabs[i % len(self.tabs)]
+            rows.append(read_survey(tab, timeout=30000, metrics=self.metrics))
+            self.metrics.observe('survey', time.perf_counter() - started.pop(i))
+            self.metrics.add_items('surveys')
+            if i + len(self.tabs) < len(urls):
+                with self.metrics.stage('navigation'):
+                    started[i + len(self.tabs)] = time.perf_counter()
+                    tab.goto(urls[i + len(self.tabs)], wait_until='commit')
+
+        return rows
+
+    def close(self):
+        # close every tab in the pool
+        for tab in self.tabs:
+            tab.close()
+
+
 if __name__ == '__main__':
 
-    # call method
-    df = access_trace_surveys('https://student.me.northeastern.edu/resources/')
-    df.to_csv('trace_data_stores/Section 6 Trace Surveys.csv', index=False)
+    # the terms are split between workers, checkpointed and merged by the runner
+    from trace_runner import run_sharded
+    run_sharded()
@@ -0,0 +1,195 @@
+"""
+File: trace_aggregates.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Precomputed professor score aggregates per instructor, per course and per (instructor, course)
+"""
+
+# import necessary libraries
+import glob
+import json
+import os
+import sys
+
+import pandas as pd
+
+from trace_cleaning import OUTPUT_COLUMNS, OUTPUT_TERM_COLUMN
+from trace_store import term_of
+
+
+# the keys of each aggregate table
+LEVELS = {
+    'instructor': ['instructor'],
+    'course': ['course_title'],
+    'instructor_course': ['instructor', 'course_title'],
+}
+
+# partial aggregates kept per (instructor, course, section csv, term); every table is rolled up from these. the
+# section csvs span several terms without saying which, so their partials have an empty term and only the csvs
+# from trace_runner (which have a term column) show up in the per term trends
+PARTIAL_COLUMNS = ['instructor', 'course_title', 'section', 'term', 'count', 'sum', 'min', 'max']
+
+
+def cleaned_section(path):
+    """
+    :param path: a cleaned csv ("All Section 3 Trace Surveys.csv")
+    :return: the label of the csv it was cleaned from ("Section 3")
+    """
+    section = term_of(path)
+    for prefix in ['All ', 'Filtered ']:
+        if section.startswith(prefix):
+            return section[len(prefix):]
+    return section
+
+
+def section_partials(path, section):
+    """
+    :param path: a cleaned csv
+    :param section: the label of the csv
+    :return: the partial aggregates of the csv, one row per (instructor, course, term)
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    usecols = OUTPUT_COLUMNS + ([OUTPUT_TERM_COLUMN] if OUTPUT_TERM_COLUMN in columns else [])
+    scores_df = pd.read_csv(path, usecols=usecols, dtype={'instructor': 'string', 'course_title': 'string',
+                                                          'course_id': 'Int64', 'professor_score': 'float64',
+                                                          OUTPUT_TERM_COLUMN: 'string'})
+    scores_df['instructor'] = scores_df['instructor'].str.strip()
+    scores_df['course_title'] = scores_df['course_title'].str.strip()
+    scores_df['term'] = scores_df[OUTPUT_TERM_COLUMN].fillna('') if OUTPUT_TERM_COLUMN in columns else ''
+    scores_df = scores_df.dropna(subset=['instructor', 'course_title', 'professor_score'])
+
+    partials_df = scores_df.groupby(['instructor', 'course_title', 'term'], sort=False)['professor_score'] \
+        .agg(['count', 'sum', 'min', 'max']).reset_index()
+    partials_df.insert(2, 'section', section)
+    return partials_df[PARTIAL_COLUMNS]
+
+
+class TraceAggregates:
+    def __init__(self, root: str = "trace_aggregates", variant: str = "All"):
+        """
+        :param root: directory holding the aggregates of every variant
+        :param variant: which cleaned csvs the aggregates are built from ('All' or 'Filtered')
+        """
+        self.variant = variant
+        self.directory = os.path.join(root, variant)
+        self._partials_path = os.path.join(self.directory, 'partials.csv')
+        self._manifest_path = os.path.join(self.directory, 'manifest.json')
+
+        # section -> {'path', 'size', 'mtime'} of the csv its partials came from
+        self.manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as manifest_file:
+                self.manifest = json.load(manifest_file)
+        if os.path.exists(self._partials_path):
+            self.partials = pd.read_csv(self._partials_path, dtype={'instructor': 'string', 'course_title': 'string',
+                                                                    'section': 'string', 'term': 'string'},
+                                        keep_default_na=False)
+        else:
+            self.partials = pd.DataFrame(columns=PARTIAL_COLUMNS)
+
+        # partials from before they were kept per section are rebuilt on the next update
+        if list(self.partials.columns) != PARTIAL_COLUMNS:
+            self.partials = pd.DataFrame(columns=PARTIAL_COLUMNS)
+            self.manifest = {}
+
+    def update(self, paths=None):
+        """
+        :param paths: cleaned csvs of this variant (every one in trace_data_stores by default)
+        :return: the sections whose partials were (re)computed
+        """
+        if paths is None:
+            paths = sorted(glob.glob(os.path.join('trace_data_stores', f"{self.variant} *Trace Surveys.csv")))
+
+        # only sections that are new or changed since the last update are read again
+        updated = {}
+        for path in paths:
+            section = cleaned_section(path)
+            stat = os.stat(path)
+            source = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+            if self.manifest.get(section) != source:
+                updated[section] = (section_partials(path, section), source)
+        if not updated:
+            return []
+
+        kept_df = self.partials[~self.partials['section'].isin(list(updated))]
+        self.partials = pd.concat([kept_df] + [x for x, _ in updated.values()], ignore_index=True)
+        for section, (_, source) in updated.items():
+            self.manifest[section] = source
+        self.save()
+        return list(updated)
+
+    def save(self):
+        # partials and then the manifest, so a crash in between only makes the next update redo some sections
+        os.makedirs(self.directory, exist_ok=True)
+        self.partials.to_csv(self._partials_path + '.tmp', index=False)
+        os.replace(self._partials_path + '.tmp', self._partials_path)
+        with open(self._manifest_path + '.tmp', 'w') as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=1)
+        os.replace(self._manifest_path + '.tmp', self._manifest_path)
+
+    def table(self, level):
+        """
+        :param level: 'instructor', 'course' or 'instructor_course'
+        :return: count, mean, min and max of the professor score per key of the level
+        """
+        summary_df = self.partials.groupby(LEVELS[level], sort=True) \
+            .agg(count=('count', 'sum'), sum=('sum', 'sum'), min=('min', 'min'), max=('max', 'max')).reset_index()
+        summary_df['mean'] = (summary_df['sum'] / summary_df['count']).round(2)
+        return summary_df[LEVELS[level] + ['count', 'mean', 'min', 'max']]
+
+    def trend(self, level):
+        """
+        :param level: 'instructor', 'course' or 'instructor_course'
+        :return: count and mean of the professor score per key of the level and term (of the surveys whose term
+        is known)
+        """
+        partials_df = self.partials[self.partials['term'] != '']
+        trend_df = partials_df.groupby(LEVELS[level] + ['term'], sort=True)[['count', 'sum']].sum().reset_index()
+        trend_df['mean'] = (trend_df['sum'] / trend_df['count']).round(2)
+        return trend_df[LEVELS[level] + ['term', 'count', 'mean']]
+
+    def export(self, output_dir=None):
+        """
+        :param output_dir: where the artifacts go (the variant's directory by default)
+        :return: the paths written
+        """
+        output_dir = output_dir if output_dir is not None else self.directory
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+
+        # a flat csv per level, for loading into a database
+        for level in LEVELS:
+            path = os.path.join(output_dir, f"by_{level}.csv")
+            self.table(level).to_csv(path, index=False)
+            paths.append(path)
+
+        # a json map per lookup the website does, so a search is one key lookup
+        pairs_df = self.table('instructor_course')
+        for level, key, other in [('instructor', 'instructor', 'course_title'),
+                                  ('course', 'course_title', 'instructor')]:
+            lookup = {}
+            for row in self.table(level).itertuples(index=False):
+                lookup[getattr(row, key)] = {'count': int(row.count), 'mean': float(row.mean),
+                                             'min': float(row.min), 'max': float(row.max), 'terms': {}, 'rows': []}
+            for row in self.trend(level).itertuples(index=False):
+                lookup[getattr(row, key)]['terms'][row.term] = float(row.mean)
+            for row in pairs_df.itertuples(index=False):
+                lookup[getattr(row, key)]['rows'].append({other: getattr(row, other), 'count': int(row.count),
+                                                          'professor_score': float(row.mean)})
+            path = os.path.join(output_dir, f"lookup_by_{level}.json")
+            with open(path + '.tmp', 'w') as lookup_file:
+                json.dump(lookup, lookup_file, ensure_ascii=False, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+            paths.append(path)
+
+        return paths
+
+
+if __name__ == '__main__':
+
+    # python trace_aggregates.py [All|Filtered] (both by default)
+    for variant in sys.argv[1:] or ['All', 'Filtered']:
+        aggregates = TraceAggregates(variant=variant)
+        updated = aggregates.update()
+        aggregates.export()
+        print(f"{variant}: Updated {len(updated)} Sections, {len(aggregates.table('instructor'))} Instructors!")
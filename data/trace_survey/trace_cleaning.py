@@ -0,0 +1,147 @@
+"""
+File: trace_cleaning.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Cleans the raw TRACE survey csvs into the All and Filtered professor score csvs (was data_cleaning.ipynb)
+"""
+
+# import necessary libraries
+import glob
+import os
+import sys
+
+import pandas as pd
+
+
+# the course details every survey row starts with
+DETAIL_COLUMNS = ['Instructor', 'Course Title', 'Section', 'Course ID']
+DETAIL_DTYPES = {'Instructor': 'string', 'Course Title': 'string', 'Section': 'string', 'Course ID': 'Int64',
+                 'Term': 'string'}
+
+# the term every row was scraped under; only csvs from trace_runner have it (the section csvs span several terms
+# without saying which)
+TERM_COLUMN = 'Term'
+NON_QUESTION_COLUMNS = DETAIL_COLUMNS + [TERM_COLUMN]
+
+# the questions every survey is asked (the scraper truncates the longer ones); a survey without the overall
+# rating is a bad trace and is left out of the Filtered output
+OVERALL_QUESTION = "What is your overall rating of this instructor's teaching effective…"
+CORE_QUESTIONS = [
+    'Online course materials were organized to help me navigate th…',
+    'Online interactions with my instructor created a sense of conne…',
+    'Online course interactions created a sense of community and…',
+    'I had the necessary computer skills and technology to success…',
+    'The syllabus was accurate and helpful in delineating expectati…',
+    'Required and additional course materials were helpful in achie…',
+    'In-class sessions were helpful for learning.',
+    'Out-of-class assignments and/or fieldwork were helpful for lear…',
+    'This course was intellectually challenging.',
+    'I learned a lot in this course.',
+    'The instructor came to class prepared to teach.',
+    'The instructor used class time effectively.',
+    'The instructor clearly communicated ideas and information.',
+    'The instructor provided sufficient feedback.',
+    'The instructor fairly evaluated my performance.',
+    'The instructor was available to assist students outside of class.',
+    'The instructor facilitated a respectful and inclusive learning env…',
+    'The instructor displayed enthusiasm for the course.',
+    OVERALL_QUESTION,
+]
+
+# what the All and Filtered csvs hold (plus a term column when the raw csv has one)
+OUTPUT_COLUMNS = ['instructor', 'course_title', 'course_id', 'professor_score']
+OUTPUT_TERM_COLUMN = 'term'
+
+
+def section_dtypes(path):
+    """
+    :param path: a raw trace survey csv
+    :return: the dtype of every column (details as strings/ints, every question as a float)
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    return {column: DETAIL_DTYPES.get(column, 'float64') for column in columns}
+
+
+def clean_chunk(surveys_df):
+    """
+    :param surveys_df: raw survey rows
+    :return: the All rows (every survey, summing every question) and the Filtered rows (surveys with an overall
+    rating, summing only the core questions)
+    """
+    questions = [column for column in surveys_df.columns if column not in NON_QUESTION_COLUMNS]
+    core_questions = [column for column in CORE_QUESTIONS if column in surveys_df.columns]
+    details_df = surveys_df[['Instructor', 'Course Title', 'Course ID']]
+    details_df.columns = OUTPUT_COLUMNS[:3]
+
+    # unanswered questions count as 0
+    all_df = details_df.assign(professor_score=surveys_df[questions].fillna(0).sum(axis=1).round(1))
+
+    if OVERALL_QUESTION in surveys_df.columns:
+        answered = surveys_df[OVERALL_QUESTION].notna()
+    else:
+        answered = pd.Series(False, index=surveys_df.index)
+    filtered_df = details_df[answered].assign(
+        professor_score=surveys_df.loc[answered, core_questions].sum(axis=1).round(1))
+
+    if TERM_COLUMN in surveys_df.columns:
+        all_df = all_df.assign(**{OUTPUT_TERM_COLUMN: surveys_df[TERM_COLUMN]})
+        filtered_df = filtered_df.assign(**{OUTPUT_TERM_COLUMN: surveys_df.loc[answered, TERM_COLUMN]})
+    return all_df, filtered_df
+
+
+def clean_section(path, output_dir=None, chunksize=5000):
+    """
+    :param path: a raw trace survey csv
+    :param output_dir: where the All/Filtered csvs go (next to the raw csv by default)
+    :param chunksize: survey rows held in memory at once
+    :return: the paths of the All and Filtered csvs, and how many surveys went into each
+    """
+    output_dir = output_dir if output_dir is not None else os.path.dirname(path)
+    name = os.path.basename(path)
+    all_path = os.path.join(output_dir, f"All {name}")
+    filtered_path = os.path.join(output_dir, f"Filtered {name}")
+
+    # both outputs are written a chunk at a time, and only replace the old ones once they are complete
+    counts = [0, 0]
+    with open(all_path + '.tmp', 'w', newline='') as all_file, \
+            open(filtered_path + '.tmp', 'w', newline='') as filtered_file:
+        for i, surveys_df in enumerate(pd.read_csv(path, dtype=section_dtypes(path), chunksize=chunksize)):
+            for j, (output_file, output_df) in enumerate(zip([all_file, filtered_file], clean_chunk(surveys_df))):
+                output_df.to_csv(output_file, header=i == 0, index=False)
+                counts[j] += len(output_df)
+    os.replace(all_path + '.tmp', all_path)
+    os.replace(filtered_path + '.tmp', filtered_path)
+
+    return all_path, filtered_path, counts[0], counts[1]
+
+
+def raw_section_paths(directory='trace_data_stores'):
+    """
+    :param directory: where the scraped csvs are
+    :return: every raw trace survey csv in it (not the cleaned All/Filtered ones, nor trace_runner's merged csv,
+    whose name doesn't end in "Trace Surveys")
+    """
+    paths = glob.glob(os.path.join(directory, '*Trace Surveys.csv'))
+    return sorted(x for x in paths if not os.path.basename(x).startswith(('All ', 'Filtered ')))
+
+
+def clean_sections(paths, output_dir=None, chunksize=5000):
+    """
+    :param paths: raw trace survey csvs
+    :param output_dir: where the All/Filtered csvs go (next to each raw csv by default)
+    :param chunksize: survey rows held in memory at once
+    :return: the (All path, Filtered path) of every section
+    """
+    outputs = []
+    for path in paths:
+        all_path, filtered_path, all_count, filtered_count = clean_section(path, output_dir, chunksize)
+        print(f"Cleaned {os.path.basename(path)}: {all_count} surveys, "
+              f"{all_count - filtered_count} without an overall rating!")
+        outputs.append((all_path, filtered_path))
+    return outputs
+
+
+if __name__ == '__main__':
+
+    # python trace_cleaning.py [<raw csv> ...] (every raw csv in trace_data_stores by default)
+    clean_sections(sys.argv[1:] or raw_section_paths())
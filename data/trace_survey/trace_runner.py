@@ -0,0 +1,204 @@
+"""
+File: trace_runner.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Splits the TRACE terms between worker processes, checkpoints every scraped page and merges the output
+"""
+
+# import necessary libraries
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from playwright.sync_api import sync_playwright
+
+# the shared modules under data/ (set up here rather than under __main__ so spawned workers get it too)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.run_metrics import RunMetrics
+from data_scrape_trace import (STORAGE_STATE_PATH, SurveyTabPool, list_terms, new_trace_context, open_report_browser,
+                               open_trace_browser, saved_session_state, scrape_term, select_term, sign_in)
+from trace_cleaning import TERM_COLUMN
+
+
+# where a full login starts from
+STUDENT_HUB_URL = 'https://student.me.northeastern.edu/resources/'
+
+# the merged csv of every term; its name doesn't end in "Trace Surveys", so it's never taken for a section csv
+MERGED_PATH = 'trace_data_stores/Trace Surveys by Term.csv'
+
+
+def term_slug(term):
+    # a file name safe version of a term name
+    return re.sub(r'[^A-Za-z0-9]+', '_', term).strip('_')
+
+
+class TermCheckpoint:
+    def __init__(self, output_dir: str, term: str):
+        """
+        :param output_dir: directory holding every term's pages and output
+        :param term: the name of the term
+        """
+        self.term = term
+        self.directory = os.path.join(output_dir, term_slug(term))
+        self.output_path = self.directory + '.csv'
+        self._checkpoint_path = os.path.join(self.directory, 'checkpoint.json')
+
+        # {'pages': pages scraped so far, 'done': whether the last page has been scraped}
+        self.state = {'pages': 0, 'done': False}
+        if os.path.exists(self._checkpoint_path):
+            with open(self._checkpoint_path) as checkpoint_file:
+                self.state = json.load(checkpoint_file)
+
+    @property
+    def done(self):
+        return self.state['done']
+
+    def next_page(self):
+        # the first page that hasn't been scraped yet
+        return self.state['pages'] + 1
+
+    def write_page(self, page_number, rows):
+        """
+        :param page_number: the page of the term's results
+        :param rows: the survey rows read off of that page
+        :return: null
+        """
+        rows = [dict(row, **{TERM_COLUMN: self.term}) for row in rows]
+        _write_json(os.path.join(self.directory, f"page_{page_number:04d}.json"), rows)
+        self.state['pages'] = page_number
+        _write_json(self._checkpoint_path, self.state)
+
+    def rows(self):
+        # every scraped row of the term, in page order, tagged with the term (pages checkpointed before the
+        # column existed get it here too)
+        rows = []
+        for page_number in range(1, self.state['pages'] + 1):
+            with open(os.path.join(self.directory, f"page_{page_number:04d}.json")) as page_file:
+                rows.extend(dict(row, **{TERM_COLUMN: self.term}) for row in json.load(page_file))
+        return rows
+
+    def finish(self):
+        # mark the term as done and write its own output
+        pd.DataFrame(self.rows()).to_csv(self.output_path, index=False)
+        self.state['done'] = True
+        _write_json(self._checkpoint_path, self.state)
+
+
+def _write_json(path, value):
+    # write the whole file or nothing, so a crash never leaves half a page behind
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as json_file:
+        json.dump(value, json_file)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    os.replace(temp_path, path)
+
+
+def scrape_term_shard(term, output_dir, state_path=STORAGE_STATE_PATH, tabs=4):
+    """ Scrapes one term in its own browser, starting at the first page that isn't checkpointed
+    :param term: the name of the term
+    :param output_dir: directory holding every term's pages and output
+    :param state_path: the signed in session saved by run_sharded
+    :param tabs: how many survey tabs load at the same time
+    :return: the number of pages the term has
+    """
+    checkpoint = TermCheckpoint(output_dir, term)
+    if checkpoint.done:
+        return checkpoint.state['pages']
+
+    # every worker appends to the same metrics file, each line tagged with its term
+    metrics = RunMetrics(os.path.join(output_dir, 'metrics.jsonl'), run_name=term)
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = new_trace_context(browser, state_path, metrics=metrics)
+        trace_tab = open_trace_browser(context)
+        if trace_tab is None:
+            raise RuntimeError("The saved TRACE session has expired; run again to log back in")
+
+        content_frame = open_report_browser(trace_tab)
+        survey_pool = SurveyTabPool(context, tabs, metrics)
+        with metrics.stage('select_term'):
+            select_term(content_frame, term)
+        if checkpoint.next_page() > 1:
+            print(f"Resuming {term} at Page #{checkpoint.next_page()}!")
+        for page_number, rows in scrape_term(content_frame, survey_pool, checkpoint.next_page()):
+            with metrics.stage('checkpoint'):
+                checkpoint.write_page(page_number, rows)
+        checkpoint.finish()
+
+        survey_pool.close()
+        context.close()
+        browser.close()
+    metrics.report()
+    metrics.close()
+    return checkpoint.state['pages']
+
+
+def merge_terms(output_dir, terms, output_path):
+    """
+    :param output_dir: directory holding every term's pages and output
+    :param terms: the terms to merge, in order
+    :param output_path: where the merged csv is written
+    :return: the merged dataframe (with a Term column saying which term each survey is from)
+    """
+    rows = []
+    for term in terms:
+        rows.extend(TermCheckpoint(output_dir, term).rows())
+    trace_df = pd.DataFrame(rows)
+    trace_df.to_csv(output_path, index=False)
+    return trace_df
+
+
+def run_sharded(output_dir='trace_data_stores/terms', output_path=MERGED_PATH, workers=3, tabs=4,
+                state_path=STORAGE_STATE_PATH, terms=None):
+    """
+    :param output_dir: directory holding every term's pages and output
+    :param output_path: where the merged csv is written once every term is done
+    :param workers: terms scraped at the same time (each in its own process and browser)
+    :param tabs: survey tabs per worker
+    :param state_path: where the signed in session is kept
+    :param terms: names of the terms to scrape (every non law term if None)
+    :return: the merged dataframe, or None if some terms still need to be scraped
+    """
+
+    # log in once up front so the workers all share the session instead of each sending a duo push
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = new_trace_context(browser, saved_session_state(state_path))
+        trace_tab = sign_in(context, STUDENT_HUB_URL, state_path)
+        if terms is None:
+            terms = list_terms(open_report_browser(trace_tab))
+        context.close()
+        browser.close()
+
+    # one task per term, so a worker that finishes a small term just picks up the next one
+    remaining = [term for term in terms if not TermCheckpoint(output_dir, term).done]
+    print(f"{len(terms) - len(remaining)} of {len(terms)} Terms Already Scraped!")
+    failed = []
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(remaining) or 1))) as pool:
+        futures = {term: pool.submit(scrape_term_shard, term, output_dir, state_path, tabs) for term in remaining}
+        for term, future in futures.items():
+            try:
+                print(f"Scraped {term} ({future.result()} pages)!")
+            except Exception as e:
+                print(f"Failed on {term}: {e}")
+                failed.append(term)
+
+    if failed:
+        print(f"{len(failed)} Terms Left; run again to resume them.")
+        return None
+    trace_df = merge_terms(output_dir, terms, output_path)
+    print(f"Merged {len(trace_df)} Surveys into {output_path}!")
+    return trace_df
+
+
+if __name__ == '__main__':
+
+    # python trace_runner.py [<term name> ...] (every non law term by default)
+    run_sharded(terms=sys.argv[1:] or None)
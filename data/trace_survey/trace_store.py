@@ -0,0 +1,209 @@
+"""
+File: trace_store.py
+Author: Owen Sharpe
+Date: 10/18/26
+Description: Columnar (Arrow IPC) store of the TRACE surveys, partitioned by term and read through memory maps
+"""
+
+# import necessary libraries
+import glob
+import json
+import os
+import shutil
+import sys
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from trace_cleaning import DETAIL_COLUMNS, NON_QUESTION_COLUMNS, raw_section_paths, section_dtypes
+
+
+# repeated strings are dictionary encoded; every question score is a float32 column named after its question id
+_LABEL = pa.dictionary(pa.int32(), pa.string())
+DETAIL_SCHEMA = pa.schema([
+    ("instructor", _LABEL),
+    ("course_title", _LABEL),
+    ("section", _LABEL),
+    ("course_id", pa.int32()),
+])
+_DETAIL_NAMES = dict(zip(DETAIL_COLUMNS, DETAIL_SCHEMA.names))
+
+# the term is the directory partition (term=<term>/) instead of a column inside the files
+_PARTITIONING = ds.partitioning(pa.schema([("term", pa.string())]), flavor="hive")
+
+
+def question_column(question_id):
+    # the column a question's scores are stored in
+    return f"q{question_id:03d}"
+
+
+def term_of(path):
+    """
+    :param path: a raw trace survey csv ("Section 3 Trace Surveys.csv", or a term csv from trace_runner)
+    :return: the term label the csv is stored under
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[:-len(" Trace Surveys")] if name.endswith(" Trace Surveys") else name
+
+
+class QuestionDictionary:
+    def __init__(self, path: str):
+        """
+        :param path: json file mapping question text to its id
+        """
+        self.path = path
+
+        # ids are only ever added, so a question keeps its column no matter which section it is first seen in
+        self.ids = {}
+        if os.path.exists(path):
+            with open(path) as questions_file:
+                self.ids = json.load(questions_file)
+        self.texts = {question_id: text for text, question_id in self.ids.items()}
+
+    def id_of(self, question):
+        # the id of a question, giving it the next free one if it's new
+        if question not in self.ids:
+            self.ids[question] = len(self.ids) + 1
+            self.texts[self.ids[question]] = question
+        return self.ids[question]
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as questions_file:
+            json.dump(self.ids, questions_file, indent=1, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+class TraceStore:
+    def __init__(self, root: str = "trace_store"):
+        """
+        :param root: directory holding one term=<term> partition per term, and the question dictionary
+        """
+        self.root = root
+        self.questions = QuestionDictionary(os.path.join(root, "questions.json"))
+
+        # uncompressed arrow files opened through memory maps are read without copying anything
+        self._filesystem = pafs.LocalFileSystem(use_mmap=True)
+
+    def surveys_to_table(self, surveys_df):
+        """
+        :param surveys_df: raw survey rows (as read from a trace survey csv)
+        :return: a pyarrow table of the surveys with dictionary encoded details and float32 question columns
+        """
+        arrays = [pa.array(surveys_df[column].astype(object).where(surveys_df[column].notna(), None),
+                           type=DETAIL_SCHEMA.field(_DETAIL_NAMES[column]).type) for column in DETAIL_COLUMNS]
+        fields = list(DETAIL_SCHEMA)
+        for question in surveys_df.columns:
+
+            # a question nobody in the chunk was asked isn't stored at all (it reads back as nulls); the term is
+            # the partition, not a column
+            if question in NON_QUESTION_COLUMNS or surveys_df[question].isna().all():
+                continue
+            arrays.append(pa.array(surveys_df[question].to_numpy('float32', na_value=float('nan')),
+                                   mask=surveys_df[question].isna().to_numpy()))
+            fields.append(pa.field(question_column(self.questions.id_of(question)), pa.float32()))
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+    def add_section(self, path, term=None, chunksize=5000):
+        """
+        :param path: a raw trace survey csv
+        :param term: the term label to store it under (taken from the file name by default)
+        :param chunksize: survey rows held in memory at once
+        :return: the number of surveys stored
+        """
+        term = term if term is not None else term_of(path)
+        partition = os.path.join(self.root, f"term={quote(term, safe='')}")
+        temp_partition = os.path.join(self.root, f"_building-{quote(term, safe='')}")
+        if os.path.isdir(temp_partition):
+            shutil.rmtree(temp_partition)
+        os.makedirs(temp_partition)
+
+        # a term is rewritten as a whole, one file per chunk, and swapped in once it is complete
+        num_of_surveys = 0
+        for i, surveys_df in enumerate(pd.read_csv(path, dtype=section_dtypes(path), chunksize=chunksize)):
+            table = self.surveys_to_table(surveys_df)
+            with pa.OSFile(os.path.join(temp_partition, f"part-{i:05d}.arrow"), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            num_of_surveys += table.num_rows
+        self.questions.save()
+
+        if os.path.isdir(partition):
+            shutil.rmtree(partition)
+        os.replace(temp_partition, partition)
+        return num_of_surveys
+
+    def terms(self):
+        # every term in the store
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(unquote(x[len("term="):]) for x in os.listdir(self.root) if x.startswith("term="))
+
+    def dataset(self):
+        # the whole store as one lazily scanned dataset; questions a term never asked read as nulls
+        paths = sorted(glob.glob(os.path.join(self.root, "term=*", "*.arrow")))
+        dataset = ds.dataset(paths, format="ipc", filesystem=self._filesystem, partitioning=_PARTITIONING,
+                             partition_base_dir=self.root)
+        schema = pa.unify_schemas([DETAIL_SCHEMA] + [x.physical_schema for x in dataset.get_fragments()] +
+                                  [_PARTITIONING.schema])
+        return dataset.replace_schema(schema)
+
+    def load_table(self, terms=None, instructors=None, course_ids=None, questions=None):
+        """
+        :param terms: only these terms (whole partitions are skipped otherwise)
+        :param instructors: only these instructors ("Last, First" as the surveys have them)
+        :param course_ids: only these course ids
+        :param questions: only these question columns, by question text (every question if None)
+        :return: a pyarrow table of the matching surveys (columns named by question id)
+        """
+        if not self.terms():
+            return DETAIL_SCHEMA.append(pa.field("term", pa.string())).empty_table()
+
+        # every condition is pushed down to the scan so non matching terms are never opened
+        condition = None
+        for expression in [
+            ds.field("term").isin(list(terms)) if terms is not None else None,
+            ds.field("instructor").isin(list(instructors)) if instructors is not None else None,
+            ds.field("course_id").isin([int(x) for x in course_ids]) if course_ids is not None else None,
+        ]:
+            if expression is not None:
+                condition = expression if condition is None else condition & expression
+
+        columns = None
+        if questions is not None:
+            columns = DETAIL_SCHEMA.names + ["term"] + [question_column(self.questions.ids[x]) for x in questions
+                                                        if x in self.questions.ids]
+        return self.dataset().to_table(columns=columns, filter=condition)
+
+    def load(self, terms=None, instructors=None, course_ids=None, questions=None):
+        """
+        :param terms: only these terms
+        :param instructors: only these instructors
+        :param course_ids: only these course ids
+        :param questions: only these questions, by question text (every question if None)
+        :return: a dataframe shaped like the raw csvs (question text headers), plus a term column
+        """
+        surveys_df = self.load_table(terms, instructors, course_ids, questions).to_pandas()
+        renames = {name: column for column, name in _DETAIL_NAMES.items()}
+        for column in surveys_df.columns:
+            if column.startswith("q") and column[1:].isdigit():
+                renames[column] = self.questions.texts[int(column[1:])]
+        return surveys_df.rename(columns=renames)
+
+    def clear(self):
+        # remove every stored survey
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        self.questions = QuestionDictionary(os.path.join(self.root, "questions.json"))
+
+
+if __name__ == '__main__':
+
+    # python trace_store.py [<raw csv> ...] (every raw csv in trace_data_stores by default)
+    store = TraceStore()
+    os.makedirs(store.root, exist_ok=True)
+    for section_path in sys.argv[1:] or raw_section_paths():
+        print(f"Stored {store.add_section(section_path)} Surveys from {os.path.basename(section_path)}!")